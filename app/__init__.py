@@ -1,6 +1,7 @@
+import logging
 from logging.config import dictConfig
 
-from flask import Flask, jsonify
+from flask import Flask
 
 
 def create_app(settings_module: str) -> Flask:
@@ -31,6 +32,10 @@ def create_app(settings_module: str) -> Flask:
 
 def __configure_logging(app: Flask) -> None:
     """Configurar logging"""
+    from .logger import register_access_log, register_request_id, start_queue_handlers
+
+    register_request_id(app)
+    register_access_log(app)
 
     if "LOGGING" not in app.config:
         return
@@ -39,18 +44,38 @@ def __configure_logging(app: Flask) -> None:
         app.logger.removeHandler(handler)
 
     dictConfig(app.config["LOGGING"])
+    start_queue_handlers()
 
 
 def __load_extensions(app: Flask) -> None:
     """Importar y e inicializar las extensiones de la app"""
-    from .db import db
+    from .db import db, register_request_transaction
+    from .core.json import FastJSONProvider
+    from .core.compression import compression
+    from .core.instrumentation import init_query_stats
+    from .core.metrics import metrics
+    from .core.ratelimit import rate_limiter
+    from .core.pool import engine_options
     from .extensions import migrations, ma, jwt, cors
+    from .auth.cache import identity_cache
+    from .auth.hashing import password_hasher
+    from .public.media import media_files
 
+    app.json = FastJSONProvider(app)
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config)
     db.init_app(app)
+    init_query_stats(app)
+    register_request_transaction(app)
     migrations.init_app(app, db)
     ma.init_app(app)
     cors.init_app(app)
     jwt.init_app(app)
+    identity_cache.init_app(app)
+    password_hasher.init_app(app)
+    metrics.init_app(app)
+    rate_limiter.init_app(app)
+    media_files.init_app(app)
+    compression.init_app(app)
 
 
 def __register_blueprints(app: Flask) -> None:
@@ -61,44 +86,60 @@ def __register_blueprints(app: Flask) -> None:
     app.register_blueprint(public)
     app.register_blueprint(auth)
 
+    if app.config.get("INTERNAL_ENDPOINTS_ENABLED", False):
+        from app.internal import internal
+
+        app.register_blueprint(internal, url_prefix=app.config["INTERNAL_URL_PREFIX"])
+
+    if app.config.get("METRICS_ENABLED", False):
+        from app.internal.routes import metrics
+
+        app.add_url_rule(app.config["METRICS_PATH"], "metrics", metrics)
+
 
 def __register_error_handlers(app: Flask) -> None:
     """Registrar error handlers del sistema"""
     from app.core import exceptions as exc
+    from app.core.errors import ErrorLog, api_error_response, message_response
+    from app.core.metrics import metrics
+
+    error_log = ErrorLog(
+        app.logger,
+        limit=app.config.get("ERROR_LOG_LIMIT", 10),
+        interval=app.config.get("ERROR_LOG_INTERVAL", 60),
+    )
+    app.extensions["error_log"] = error_log
 
     @app.errorhandler(Exception)
     @app.errorhandler(500)
     def general_error_handler(e):
-        app.logger.debug(e, exc_info=True)
-        app.logger.error("Unexpected server error")
-        return jsonify(message="Internal Server Error"), 500
+        metrics.observe_error(e)
+        error_log.log(e, "Unexpected server error")
+        return message_response("Internal Server Error", 500)
 
     @app.errorhandler(NotImplementedError)
     def not_implemented_error_handler(e):
-        app.logger.debug(e, exc_info=True)
-        app.logger.warning("Incomplete feature requested")
-        return jsonify(message="Sorry! Feature under construction"), 500
+        metrics.observe_error(e)
+        error_log.log(e, "Incomplete feature requested", logging.WARNING)
+        return message_response("Sorry! Feature under construction", 500)
 
     @app.errorhandler(405)
     def not_allowed_handler(e):
-        return jsonify(message="Method not allowed"), 405
+        return message_response("Method not allowed", 405)
 
     @app.errorhandler(404)
     def general_not_found_error_handler(e):
-        return jsonify(message="Resource not found"), 404
-
-    @app.errorhandler(exc.NotFoundError)
-    def not_found_error_handler(e: exc.BaseApiError):
-        return jsonify(e.to_dict()), e.status_code
-
-    @app.errorhandler(exc.PermissionsError)
-    def permissions_error_handler(e: exc.BaseApiError):
-        return jsonify(e.to_dict()), e.status_code
-
-    @app.errorhandler(exc.NotAuthorizedError)
-    def not_authorized_error_handler(e: exc.BaseApiError):
-        return jsonify(e.to_dict()), e.status_code
-
-    @app.errorhandler(exc.BadRequestError)
-    def bad_request_error_handler(e: exc.BaseApiError):
-        return jsonify(e.to_dict()), e.status_code
+        return message_response("Resource not found", 404)
+
+    @app.errorhandler(exc.BaseApiError)
+    def api_error_handler(e: exc.BaseApiError):
+        metrics.observe_error(e)
+        return api_error_response(e)
+
+    @app.errorhandler(exc.TooManyRequestsError)
+    @app.errorhandler(exc.ServiceUnavailableError)
+    def retry_after_error_handler(e: exc.ServiceUnavailableError):
+        metrics.observe_error(e)
+        response = api_error_response(e)
+        response.headers["Retry-After"] = str(e.retry_after)
+        return response
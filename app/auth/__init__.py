@@ -2,4 +2,4 @@ from flask import Blueprint
 
 auth = Blueprint("auth", __name__)
 
-from . import routes  # noqa: F401,E402
+from . import routes, commands  # noqa: F401,E402
@@ -0,0 +1,194 @@
+"""
+Importación masiva de usuarios y asignación de roles
+"""
+import csv
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from itertools import islice
+from typing import IO, Dict, Iterable, Iterator, List, Tuple
+from uuid import UUID, uuid4
+
+import sqlalchemy as sa
+from marshmallow import ValidationError
+from sqlalchemy.exc import IntegrityError
+
+from app.core.exceptions import BadRequestError
+from app.core.serializers import compile_schema
+from app.db import db
+from .hashing import password_hasher
+from .models import Role, User, user_role
+from .schemas import UserImportSchema
+
+Row = Tuple[int, dict]
+
+import_schema = compile_schema(UserImportSchema(many=True))
+
+
+@dataclass
+class ImportReport:
+    """Resultado de una importación, con los errores de cada fila"""
+
+    created: int = 0
+    errors: List[dict] = field(default_factory=list)
+
+    def add_error(self, row: int, messages) -> None:
+        self.errors.append({"row": row, "errors": messages})
+
+    def to_dict(self) -> dict:
+        return {
+            "created": self.created,
+            "failed": len(self.errors),
+            "errors": self.errors,
+        }
+
+
+def read_ndjson(stream: IO[str]) -> Iterator[Row]:
+    """Itera las filas de un archivo con un objeto JSON por línea"""
+    for number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError:
+            yield number, None
+
+
+def read_csv(stream: IO[str]) -> Iterator[Row]:
+    """Itera las filas de un CSV con encabezados; ``roles`` separados por ``|``"""
+    for number, data in enumerate(csv.DictReader(stream), start=2):
+        if data.get("roles") is not None:
+            data["roles"] = [name for name in data["roles"].split("|") if name]
+        if data.get("is_active") is not None:
+            data["isActive"] = data.pop("is_active")
+        yield number, data
+
+
+READERS = {
+    "application/x-ndjson": read_ndjson,
+    "application/jsonl": read_ndjson,
+    "text/csv": read_csv,
+}
+
+
+def reader_for(mimetype: str):
+    """Devuelve el lector para el tipo de contenido o lanza ``BadRequestError``"""
+    try:
+        return READERS[mimetype]
+    except KeyError:
+        raise BadRequestError(f"Unsupported content type {mimetype!r}")
+
+
+def import_users(rows: Iterable[Row], chunk_size: int = 1000) -> ImportReport:
+    """Validar e insertar usuarios por lotes
+
+    Cada lote se valida con ``UserImportSchema``, se generan los hashes en paralelo
+    y se insertan usuarios y roles con un ``INSERT`` por lote. Las filas inválidas
+    se reportan sin detener el resto de la importación.
+    """
+    report = ImportReport()
+    role_ids = {
+        name: id for id, name in db.session.execute(sa.select(Role.id, Role.name))
+    }
+    seen = set()
+    rows = iter(rows)
+
+    while chunk := list(islice(rows, chunk_size)):
+        valid = _validate(chunk, role_ids, seen, report)
+        if not valid:
+            continue
+
+        hashes = password_hasher.hash_many([data["password"] for _, data in valid])
+        now = datetime.now()
+        users, links = [], []
+        for (number, data), pwhash in zip(valid, hashes):
+            user_id = uuid4()
+            users.append(
+                {
+                    "id": user_id,
+                    "email": data["email"],
+                    "password": pwhash,
+                    "is_active": data.get("is_active", True),
+                    "created_at": now,
+                }
+            )
+            links.extend(
+                {"user_id": user_id, "role_id": role_ids[name]}
+                for name in data["roles"]
+            )
+
+        report.created += _insert(valid, users, links, report)
+
+    return report
+
+
+def _validate(
+    chunk: List[Row], role_ids: Dict[str, UUID], seen: set, report: ImportReport
+) -> List[Row]:
+    for number, data in chunk:
+        if not isinstance(data, dict):
+            report.add_error(number, {"_schema": ["Invalid row"]})
+    chunk = [(number, data) for number, data in chunk if isinstance(data, dict)]
+    try:
+        loaded = import_schema.load([data for _, data in chunk])
+        messages = {}
+    except ValidationError as e:
+        loaded, messages = e.valid_data, e.messages
+
+    candidates = []
+    for index, ((number, _), data) in enumerate(zip(chunk, loaded)):
+        if index in messages:
+            report.add_error(number, messages[index])
+            continue
+        unknown = [name for name in data["roles"] if name not in role_ids]
+        if unknown:
+            report.add_error(
+                number, {"roles": [f"Unknown role {name!r}" for name in unknown]}
+            )
+            continue
+        email = data["email"].lower()
+        if email in seen:
+            report.add_error(number, {"email": ["Duplicated email"]})
+            continue
+        seen.add(email)
+        candidates.append((number, data))
+
+    emails = [data["email"] for _, data in candidates]
+    existing = set(
+        db.session.scalars(sa.select(User.email).where(User.email.in_(emails)))
+    )
+    valid = []
+    for number, data in candidates:
+        if data["email"] in existing:
+            report.add_error(number, {"email": ["Email already registered"]})
+        else:
+            valid.append((number, data))
+    return valid
+
+
+def _insert(
+    valid: List[Row], users: List[dict], links: List[dict], report: ImportReport
+) -> int:
+    try:
+        db.session.execute(sa.insert(User), users)
+        if links:
+            db.session.execute(sa.insert(user_role), links)
+        db.session.commit()
+        return len(users)
+    except IntegrityError:
+        db.session.rollback()
+
+    # Un registro concurrente invalidó el lote, se reintenta fila por fila
+    created = 0
+    for (number, _), user in zip(valid, users):
+        user_links = [link for link in links if link["user_id"] == user["id"]]
+        try:
+            with db.session.begin_nested():
+                db.session.execute(sa.insert(User), [user])
+                if user_links:
+                    db.session.execute(sa.insert(user_role), user_links)
+            created += 1
+        except IntegrityError as e:
+            report.add_error(number, {"_schema": [str(e.orig).strip()]})
+    db.session.commit()
+    return created
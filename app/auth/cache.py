@@ -0,0 +1,114 @@
+"""
+Cache en proceso de la identidad de los usuarios autenticados
+"""
+from typing import Hashable, Iterable, Optional, TypeVar
+
+import sqlalchemy as sa
+from flask import Flask, current_app, has_app_context
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.session import make_transient_to_detached
+
+from app.core.cache import LRUCache
+from app.db import db
+
+T = TypeVar("T")
+
+
+def detached_copy(instance: T, relationships: Iterable[str] = ()) -> T:
+    """Genera una copia desligada de la sesión con el estado cargado de la instancia
+
+    Las relaciones indicadas se copian un nivel, sin historial de cambios, para que
+    la copia pueda volver a una sesión con ``merge(load=False)`` sin consultas.
+    """
+    mapper = sa.inspect(type(instance))
+    values = {attr.key: getattr(instance, attr.key) for attr in mapper.column_attrs}
+    copy = mapper.class_(**values)
+    make_transient_to_detached(copy)
+    for name in relationships:
+        related = [detached_copy(item) for item in getattr(instance, name)]
+        set_committed_value(copy, name, related)
+    return copy
+
+
+class IdentityCache:
+    """Cache LRU con expiración de usuarios y roles, indexado por ID de usuario"""
+
+    extension_name = "identity_cache"
+
+    def __init__(self, app: Flask = None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        app.config.setdefault("AUTH_IDENTITY_CACHE_SIZE", 1024)
+        app.config.setdefault("AUTH_IDENTITY_CACHE_TTL", 60)
+        app.extensions[self.extension_name] = LRUCache(
+            maxsize=app.config["AUTH_IDENTITY_CACHE_SIZE"],
+            ttl=app.config["AUTH_IDENTITY_CACHE_TTL"],
+        )
+
+    @property
+    def cache(self) -> Optional[LRUCache]:
+        if not has_app_context():
+            return None
+        return current_app.extensions.get(self.extension_name)
+
+    def get(self, identity: Hashable):
+        """Devuelve el usuario en cache ligado a la sesión actual o ``None``"""
+        cache = self.cache
+        if cache is None:
+            return None
+        snapshot = cache.get(str(identity))
+        if snapshot is None:
+            return None
+        current = db.session.identity_map.get(sa.inspect(snapshot).identity_key)
+        if current is not None:
+            return current
+        return db.session.merge(snapshot, load=False)
+
+    def set(self, identity: Hashable, user) -> None:
+        """Guardar una copia del usuario y sus roles"""
+        cache = self.cache
+        if cache is None:
+            return
+        cache.set(str(identity), detached_copy(user, relationships=("roles",)))
+
+    def get_role_version(self, identity: Hashable) -> Optional[int]:
+        """Devuelve la versión de roles del usuario en cache o ``None``"""
+        cache = self.cache
+        if cache is None:
+            return None
+        version = cache.get(("role_version", str(identity)))
+        if version is None:
+            snapshot = cache.get(str(identity))
+            version = snapshot.role_version if snapshot is not None else None
+        return version
+
+    def set_role_version(self, identity: Hashable, version: int) -> None:
+        """Guardar la versión de roles del usuario"""
+        cache = self.cache
+        if cache is not None:
+            cache.set(("role_version", str(identity)), version)
+
+    def invalidate(self, *identities: Hashable) -> None:
+        """Descartar los usuarios indicados"""
+        cache = self.cache
+        if cache is None:
+            return
+        for identity in identities:
+            cache.delete(str(identity))
+            cache.delete(("role_version", str(identity)))
+
+    def clear(self) -> None:
+        """Descartar todos los usuarios"""
+        cache = self.cache
+        if cache is not None:
+            cache.clear()
+
+    def stats(self) -> dict:
+        """Devuelve los contadores de aciertos y fallos"""
+        cache = self.cache
+        return cache.stats() if cache is not None else {}
+
+
+identity_cache = IdentityCache()
@@ -0,0 +1,28 @@
+import click
+from flask import current_app
+
+from . import auth
+from .bulk import import_users, read_csv, read_ndjson
+
+
+@auth.cli.command("import-users")
+@click.argument("file", type=click.File("r", encoding="utf-8"))
+@click.option(
+    "--format",
+    "file_format",
+    type=click.Choice(["ndjson", "csv"]),
+    help="Formato del archivo, por defecto según la extensión",
+)
+@click.option("--chunk-size", type=int, help="Filas por lote")
+def import_users_command(file, file_format, chunk_size):
+    """Importar usuarios desde un archivo NDJSON o CSV"""
+    if file_format is None:
+        file_format = "csv" if file.name.endswith(".csv") else "ndjson"
+    read = read_csv if file_format == "csv" else read_ndjson
+    chunk_size = chunk_size or current_app.config["BULK_IMPORT_CHUNK_SIZE"]
+
+    report = import_users(read(file), chunk_size=chunk_size)
+
+    for error in report.errors:
+        click.echo(f"Row {error['row']}: {error['errors']}", err=True)
+    click.echo(f"Created {report.created} users, {len(report.errors)} rows failed")
@@ -1,8 +1,29 @@
 from functools import wraps
 
-from flask_jwt_extended import verify_jwt_in_request, current_user
+from flask_jwt_extended import verify_jwt_in_request, current_user, get_jwt
 
-from app.core.exceptions import PermissionsError
+from app.core.exceptions import NotAuthorizedError, PermissionsError
+from .models import (
+    ROLES_CLAIM,
+    ROLE_VERSION_CLAIM,
+    load_role_version,
+    role_claims_enabled,
+)
+
+
+def get_user_roles() -> set:
+    """Devuelve los nombres de los roles del usuario autenticado
+
+    Si el token incluye los roles se usan los claims verificados, rechazando el
+    token si la versión de roles del usuario cambió desde su emisión.
+    """
+    claims = get_jwt()
+    if not role_claims_enabled(claims):
+        return {role.name for role in current_user.roles}
+
+    if claims.get(ROLE_VERSION_CLAIM) != load_role_version(claims["sub"]):
+        raise NotAuthorizedError
+    return set(claims[ROLES_CLAIM])
 
 
 def role_required(*names):
@@ -12,7 +33,7 @@ def role_required(*names):
         @wraps(view_func)
         def decorator(*args, **kwargs):
             verify_jwt_in_request()
-            user_roles = [role.name for role in current_user.roles]
+            user_roles = get_user_roles()
             if any(role_name not in user_roles for role_name in names):
                 raise PermissionsError
             return view_func(*args, **kwargs)
@@ -0,0 +1,154 @@
+"""
+Servicio de hashing de contraseñas en un pool de procesos acotado
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from itertools import repeat
+from threading import BoundedSemaphore, Lock
+from typing import Callable, List, Optional
+
+from flask import Flask, current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from app.core.exceptions import ServiceUnavailableError
+
+
+class _HasherState:
+    """Pool de procesos y límite de tareas en curso de una aplicación"""
+
+    def __init__(self, config: dict):
+        self.method = config["PASSWORD_HASH_METHOD"]
+        self.salt_length = config["PASSWORD_HASH_SALT_LENGTH"]
+        self.workers = config["PASSWORD_HASH_WORKERS"]
+        self.timeout = config["PASSWORD_HASH_TIMEOUT"]
+        self.retry_after = config["PASSWORD_HASH_RETRY_AFTER"]
+        self.start_method = config["PASSWORD_HASH_START_METHOD"]
+        self.slots = BoundedSemaphore(self.workers + config["PASSWORD_HASH_QUEUE_SIZE"])
+        self.method_prefix: Optional[str] = None
+        self.rejected = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = Lock()
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        # Se crea al primer uso para que cada worker del servidor tenga su pool
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(self.start_method),
+                )
+            return self._executor
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+
+
+class PasswordHasher:
+    """Genera y verifica hashes de contraseñas fuera del hilo de la solicitud
+
+    Con ``PASSWORD_HASH_WORKERS = 0`` el hashing se ejecuta en el mismo hilo.
+    """
+
+    extension_name = "password_hasher"
+
+    def __init__(self, app: Flask = None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        app.config.setdefault("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+        app.config.setdefault("PASSWORD_HASH_SALT_LENGTH", 16)
+        app.config.setdefault("PASSWORD_HASH_WORKERS", 0)
+        app.config.setdefault("PASSWORD_HASH_QUEUE_SIZE", 32)
+        app.config.setdefault("PASSWORD_HASH_TIMEOUT", 10)
+        app.config.setdefault("PASSWORD_HASH_RETRY_AFTER", 1)
+        app.config.setdefault("PASSWORD_HASH_START_METHOD", "spawn")
+        app.extensions[self.extension_name] = _HasherState(app.config)
+
+    @property
+    def state(self) -> _HasherState:
+        return current_app.extensions[self.extension_name]
+
+    def hash(self, password: str) -> str:
+        """Devuelve el hash de la contraseña con el método configurado"""
+        state = self.state
+        return self._run(
+            state, generate_password_hash, password, state.method, state.salt_length
+        )
+
+    def verify(self, pwhash: str, password: str) -> bool:
+        """Verifica la contraseña contra el hash guardado"""
+        return self._run(self.state, check_password_hash, pwhash, password)
+
+    def hash_many(self, passwords: List[str]) -> List[str]:
+        """Devuelve los hashes de varias contraseñas repartidos entre el pool
+
+        Pensado para procesos masivos, por lo que no aplica el límite de la cola.
+        """
+        state = self.state
+        if state.workers <= 0:
+            return [
+                generate_password_hash(p, state.method, state.salt_length)
+                for p in passwords
+            ]
+        chunksize = max(1, len(passwords) // (state.workers * 4))
+        return list(
+            state.executor.map(
+                generate_password_hash,
+                passwords,
+                repeat(state.method),
+                repeat(state.salt_length),
+                chunksize=chunksize,
+            )
+        )
+
+    def needs_rehash(self, pwhash: str) -> bool:
+        """Indica si el hash fue generado con parámetros distintos a los actuales"""
+        state = self.state
+        if state.method_prefix is None:
+            # Werkzeug normaliza el método, p. ej. ``scrypt`` -> ``scrypt:32768:8:1``
+            sample = generate_password_hash("", state.method, state.salt_length)
+            state.method_prefix = sample.split("$", 1)[0]
+        return pwhash.split("$", 1)[0] != state.method_prefix
+
+    def stats(self) -> dict:
+        """Devuelve la configuración del pool y las solicitudes rechazadas"""
+        state = self.state
+        return {
+            "method": state.method,
+            "workers": state.workers,
+            "rejected": state.rejected,
+        }
+
+    def shutdown(self) -> None:
+        """Detener el pool de procesos de la aplicación"""
+        self.state.shutdown()
+
+    @staticmethod
+    def _run(state: _HasherState, func: Callable, *args):
+        if state.workers <= 0:
+            return func(*args)
+
+        if not state.slots.acquire(blocking=False):
+            state.rejected += 1
+            raise ServiceUnavailableError(retry_after=state.retry_after)
+        try:
+            future = state.executor.submit(func, *args)
+        except Exception:
+            state.slots.release()
+            raise
+        future.add_done_callback(lambda _: state.slots.release())
+
+        try:
+            return future.result(timeout=state.timeout)
+        except TimeoutError:
+            future.cancel()
+            state.rejected += 1
+            raise ServiceUnavailableError(retry_after=state.retry_after)
+
+
+password_hasher = PasswordHasher()
@@ -3,12 +3,15 @@ from typing import Optional, List
 from uuid import uuid4, UUID
 
 import sqlalchemy as sa
-from sqlalchemy.orm import Mapped, mapped_column, relationship
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import current_app
+from sqlalchemy.orm import Mapped, mapped_column, relationship, selectinload
+from werkzeug.local import LocalProxy
 
 from app.core.exceptions import NotAuthorizedError
-from app.db import BaseModel, db
+from app.db import BaseModel, LoadOptions, db, to_uuid
 from app.extensions import jwt
+from .cache import identity_cache
+from .hashing import password_hasher
 
 
 class Role(BaseModel):
@@ -16,7 +19,7 @@ class Role(BaseModel):
 
     __tablename__ = "auth_role"
 
-    id: Mapped[UUID] = mapped_column(sa.UUID, primary_key=True, default=uuid4)
+    id: Mapped[UUID] = mapped_column(sa.Uuid, primary_key=True, default=uuid4)
     name: Mapped[str] = mapped_column(sa.String, nullable=False, unique=True)
     title: Mapped[Optional[str]] = mapped_column(sa.String)
     description: Mapped[Optional[str]] = mapped_column(sa.String)
@@ -28,22 +31,22 @@ class Role(BaseModel):
     )
 
     @classmethod
-    def get_id(cls, id: str | UUID) -> Optional["Role"]:
+    def get_id(cls, id: str | UUID, load: LoadOptions = None) -> Optional["Role"]:
         """Devuelve el rol con el ID o ``None``"""
-        stmt = sa.select(cls).where(cls.id == id)
+        stmt = cls.select(cls.id == to_uuid(id), load=load)
         return db.session.scalar(stmt)
 
     @classmethod
-    def get_name(cls, name: str) -> Optional["Role"]:
+    def get_name(cls, name: str, load: LoadOptions = None) -> Optional["Role"]:
         """Devuelve el rol con el nombre o ``None``"""
-        stmt = sa.select(cls).where(cls.name == name)
+        stmt = cls.select(cls.name == name, load=load)
         return db.session.scalar(stmt)
 
 
 user_role = db.Table(
     "auth_user_role",
-    sa.Column("user_id", sa.UUID, sa.ForeignKey("auth_user.id"), primary_key=True),
-    sa.Column("role_id", sa.UUID, sa.ForeignKey("auth_role.id"), primary_key=True),
+    sa.Column("user_id", sa.Uuid, sa.ForeignKey("auth_user.id"), primary_key=True),
+    sa.Column("role_id", sa.Uuid, sa.ForeignKey("auth_role.id"), primary_key=True),
 )
 
 
@@ -52,10 +55,13 @@ class User(BaseModel):
 
     __tablename__ = "auth_user"
 
-    id: Mapped[UUID] = mapped_column(sa.UUID, primary_key=True, default=uuid4)
+    id: Mapped[UUID] = mapped_column(sa.Uuid, primary_key=True, default=uuid4)
     email: Mapped[str] = mapped_column(sa.String, nullable=False, unique=True)
     password: Mapped[str] = mapped_column(sa.String, nullable=False)
     is_active: Mapped[bool] = mapped_column(sa.Boolean, nullable=False, default=True)
+    role_version: Mapped[int] = mapped_column(
+        sa.Integer, nullable=False, default=0, server_default="0"
+    )
     created_at: Mapped[datetime] = mapped_column(
         sa.DateTime, nullable=False, default=datetime.now
     )
@@ -63,7 +69,7 @@ class User(BaseModel):
         sa.DateTime, onupdate=datetime.now
     )
 
-    roles: Mapped[List[Role]] = relationship(Role, secondary=user_role)
+    roles: Mapped[List[Role]] = relationship(Role, secondary=user_role, lazy="selectin")
 
     def save(self, set_password=True):
         if set_password:
@@ -71,33 +77,140 @@ class User(BaseModel):
         super().save()
 
     def set_password(self, password: str) -> None:
-        self.password = generate_password_hash(password)
+        self.password = password_hasher.hash(password)
 
     def check_password(self, password: str) -> bool:
-        return check_password_hash(self.password, password)
+        return password_hasher.verify(self.password, password)
+
+    def needs_rehash(self) -> bool:
+        """Indica si la contraseña usa parámetros de hashing desactualizados"""
+        return password_hasher.needs_rehash(self.password)
 
     @classmethod
-    def get_id(cls, id: str | UUID) -> Optional["User"]:
+    def get_id(cls, id: str | UUID, load: LoadOptions = None) -> Optional["User"]:
         """Devuelve el usuario con el ID o ``None``"""
-        stmt = sa.select(cls).where(cls.id == id)
+        stmt = cls.select(cls.id == to_uuid(id), load=load)
         return db.session.scalar(stmt)
 
     @classmethod
-    def get_email(cls, email: str) -> Optional["User"]:
+    def get_email(cls, email: str, load: LoadOptions = None) -> Optional["User"]:
         """Devuelve el usuario con el email o ``None``"""
-        stmt = sa.select(cls).where(cls.email == email)
+        stmt = cls.select(cls.email == email, load=load)
         return db.session.scalar(stmt)
 
+    @classmethod
+    def get_role_version(cls, id: str | UUID) -> Optional[int]:
+        """Devuelve la versión de los roles del usuario sin cargar el registro"""
+        stmt = sa.select(cls.role_version).where(cls.id == to_uuid(id))
+        return db.session.scalar(stmt)
+
+
+# Opciones de carga para los usuarios autenticados
+WITH_ROLES = (selectinload(User.roles),)
+
+ROLES_CLAIM = "roles"
+ROLE_VERSION_CLAIM = "rv"
+
+
+def load_user(identity: str) -> User:
+    """Devuelve el usuario autenticado desde el cache o la db"""
+    user = identity_cache.get(identity)
+    if user is not None:
+        return user
+
+    user = User.get_id(identity, load=WITH_ROLES)
+    if user is None:
+        raise NotAuthorizedError
+    identity_cache.set(identity, user)
+    return user
+
+
+def load_role_version(identity: str) -> int:
+    """Devuelve la versión vigente de los roles del usuario"""
+    version = identity_cache.get_role_version(identity)
+    if version is not None:
+        return version
+
+    version = User.get_role_version(identity)
+    if version is None:
+        raise NotAuthorizedError
+    identity_cache.set_role_version(identity, version)
+    return version
+
+
+def role_claims_enabled(jwt_data: dict = None) -> bool:
+    """Indica si los roles se leen de los claims del token"""
+    if not current_app.config.get("AUTH_ROLE_CLAIMS", False):
+        return False
+    return jwt_data is None or ROLES_CLAIM in jwt_data
+
 
 @jwt.user_identity_loader
 def user_identity_lookup(user: User):
     return user.id
 
 
+@jwt.additional_claims_loader
+def role_claims_loader(user: User) -> dict:
+    if not role_claims_enabled():
+        return {}
+    return {
+        ROLES_CLAIM: [role.name for role in user.roles],
+        ROLE_VERSION_CLAIM: user.role_version,
+    }
+
+
 @jwt.user_lookup_loader
 def user_lookup_callback(_jwt_header, jwt_data) -> User:
     identity = jwt_data["sub"]
-    user = User.get_id(identity)
-    if user is None:
-        raise NotAuthorizedError
-    return user
+    if not role_claims_enabled(jwt_data):
+        return load_user(identity)
+
+    # Los roles vienen en el token, el usuario se carga sólo si se utiliza
+    loaded = []
+
+    def lazy_user() -> User:
+        if not loaded:
+            loaded.append(load_user(identity))
+        return loaded[0]
+
+    return LocalProxy(lazy_user)
+
+
+@sa.event.listens_for(db.session, "before_flush")
+def track_identity_changes(session, _flush_context, _instances):
+    """Registrar los usuarios y roles modificados en la transacción"""
+    changed = session.info.setdefault("identity_changes", set())
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(instance, User):
+            changed.add(instance.id)
+        elif isinstance(instance, Role):
+            changed.add(Role)
+
+
+@sa.event.listens_for(db.session, "before_flush")
+def bump_role_version(session, _flush_context, _instances):
+    """Incrementar la versión de los roles de los usuarios modificados"""
+    for instance in session.dirty:
+        if (
+            isinstance(instance, User)
+            and sa.inspect(instance).attrs.roles.history.has_changes()
+        ):
+            instance.role_version = (instance.role_version or 0) + 1
+
+
+@sa.event.listens_for(db.session, "after_commit")
+def invalidate_identity_cache(session):
+    """Descartar del cache los usuarios modificados una vez confirmados"""
+    changed = session.info.pop("identity_changes", None)
+    if not changed:
+        return
+    if Role in changed:
+        identity_cache.clear()
+    else:
+        identity_cache.invalidate(*changed)
+
+
+@sa.event.listens_for(db.session, "after_rollback")
+def discard_identity_changes(session):
+    session.info.pop("identity_changes", None)
@@ -1,4 +1,6 @@
-from flask import request, jsonify
+import io
+
+from flask import request, jsonify, current_app
 from flask_jwt_extended import (
     create_access_token,
     set_access_cookies,
@@ -7,18 +9,31 @@ from flask_jwt_extended import (
     jwt_required,
 )
 
-from app.core.exceptions import NotAuthorizedError
+from app.core.exceptions import BadRequestError, NotAuthorizedError
+from app.core.ratelimit import rate_limiter
+from app.core.responses import stream_json_array
+from app.core.serializers import compile_schema
 from . import auth
+from .bulk import import_users, reader_for
 from .decorators import role_required
-from .models import User
+from .models import User, WITH_ROLES
 from .schemas import LoginSchema, UserSchema
 
-user_schema = UserSchema()
-login_schema = LoginSchema()
-signup_schema = UserSchema(only=("email", "password"))
+user_schema = compile_schema(UserSchema())
+login_schema = compile_schema(LoginSchema())
+signup_schema = compile_schema(UserSchema(only=("email", "password")))
+
+
+def login_email():
+    """Llave del límite por usuario, sin validar aún la solicitud"""
+    data = request.get_json(silent=True)
+    email = data.get("email") if isinstance(data, dict) else None
+    return email.strip().lower() if isinstance(email, str) and email else None
 
 
 @auth.post("/login")
+@rate_limiter.limit("login-ip", "RATELIMIT_LOGIN_IP")
+@rate_limiter.limit("login-email", "RATELIMIT_LOGIN_EMAIL", login_email)
 def login():
     """Iniciar sesión"""
     load = login_schema.load(request.get_json())
@@ -27,6 +42,10 @@ def login():
     if user is None or not user.check_password(load["password"]):
         raise NotAuthorizedError
 
+    if user.needs_rehash():
+        user.set_password(load["password"])
+        user.save(set_password=False)
+
     access_token = create_access_token(user)
     response = jsonify(message="Success!")
     set_access_cookies(response, access_token)
@@ -63,3 +82,46 @@ def logout():
     response = jsonify(message="Bye!")
     unset_access_cookies(response)
     return response
+
+
+@auth.get("/users")
+@role_required("ADMINISTRATOR")
+def list_users():
+    """Listar usuarios paginados por cursor"""
+    limit = request.args.get(
+        "limit", current_app.config["PAGINATION_DEFAULT_LIMIT"], type=int
+    )
+    if not 0 < limit <= current_app.config["PAGINATION_MAX_LIMIT"]:
+        raise BadRequestError("Invalid limit")
+
+    page = User.paginate_keyset(
+        limit=limit, cursor=request.args.get("cursor"), load=WITH_ROLES
+    )
+    return jsonify(items=user_schema.dump(page.items, many=True), next=page.next_cursor)
+
+
+@auth.get("/users/export")
+@role_required("ADMINISTRATOR")
+def export_users():
+    """Exportar todos los usuarios como un arreglo JSON transmitido por partes"""
+    users = User.stream(
+        batch_size=current_app.config["EXPORT_BATCH_SIZE"], load=WITH_ROLES
+    )
+    return stream_json_array(users, user_schema.dump)
+
+
+@auth.post("/users/import")
+@role_required("ADMINISTRATOR")
+def bulk_import_users():
+    """Importar usuarios desde un cuerpo NDJSON o CSV"""
+    read = reader_for(request.mimetype)
+    chunk_size = request.args.get(
+        "chunkSize", current_app.config["BULK_IMPORT_CHUNK_SIZE"], type=int
+    )
+    if chunk_size <= 0:
+        raise BadRequestError("Invalid chunk size")
+
+    encoding = request.mimetype_params.get("charset", "utf-8")
+    stream = io.TextIOWrapper(request.stream, encoding=encoding, newline="")
+    report = import_users(read(stream), chunk_size=chunk_size)
+    return jsonify(report.to_dict())
@@ -30,3 +30,14 @@ class LoginSchema(ma.Schema):
 
     email = f.Email(required=True)
     password = f.String(required=True, load_only=True)
+
+
+class UserImportSchema(UserSchema):
+    """Representa un usuario en una importación masiva"""
+
+    email = f.Email(required=True)
+    password = f.String(required=True, load_only=True)
+    roles = f.List(f.String(), load_default=list)
+
+    class Meta:
+        fields = ("email", "password", "is_active", "roles")
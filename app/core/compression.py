@@ -0,0 +1,93 @@
+"""
+Compresión gzip/brotli de las respuestas según ``Accept-Encoding``
+"""
+import gzip
+from typing import Callable, Dict, Iterable, Optional
+
+from flask import Flask, Response, current_app, request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+# Codificaciones disponibles, en orden de preferencia
+ENCODERS: Dict[str, Callable[[bytes, int], bytes]] = {}
+if brotli is not None:
+    ENCODERS["br"] = lambda data, level: brotli.compress(data, quality=level)
+ENCODERS["gzip"] = lambda data, level: gzip.compress(data, level, mtime=0)
+
+# Extensión de los archivos precomprimidos de cada codificación
+SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+def negotiate(available: Iterable[str]) -> Optional[str]:
+    """Elige la codificación aceptada por el cliente entre ``available``
+
+    Si el cliente acepta varias con la misma calidad, gana la primera de la lista.
+    """
+    available = list(available)
+    if not available:
+        return None
+    return request.accept_encodings.best_match(available)
+
+
+def compress(data: bytes, encoding: str, level: int) -> bytes:
+    return ENCODERS[encoding](data, level)
+
+
+class Compression:
+    """Comprime las respuestas de los tipos configurados que superen un tamaño
+
+    Sólo se comprimen las respuestas con cuerpo en memoria; las enviadas por
+    partes o desde archivos se dejan intactas.
+    """
+
+    extension_name = "compression"
+
+    def __init__(self, app: Flask = None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        app.config.setdefault("COMPRESS_ENABLED", True)
+        app.config.setdefault("COMPRESS_MIMETYPES", ["application/json"])
+        app.config.setdefault("COMPRESS_MIN_SIZE", 1024)
+        app.config.setdefault("COMPRESS_GZIP_LEVEL", 6)
+        app.config.setdefault("COMPRESS_BR_LEVEL", 4)
+        app.extensions[self.extension_name] = self
+        app.after_request(self.compress_response)
+
+    @staticmethod
+    def compress_response(response: Response) -> Response:
+        config = current_app.config
+        if (
+            not config["COMPRESS_ENABLED"]
+            or response.mimetype not in config["COMPRESS_MIMETYPES"]
+            or response.direct_passthrough
+            or response.is_streamed
+            or "Content-Encoding" in response.headers
+            or not 200 <= response.status_code < 300
+            or response.status_code == 206
+        ):
+            return response
+
+        response.vary.add("Accept-Encoding")
+        if response.calculate_content_length() < config["COMPRESS_MIN_SIZE"]:
+            return response
+        encoding = negotiate(ENCODERS)
+        if encoding is None:
+            return response
+
+        level = config[
+            "COMPRESS_BR_LEVEL" if encoding == "br" else "COMPRESS_GZIP_LEVEL"
+        ]
+        response.set_data(compress(response.get_data(), encoding, level))
+        response.headers["Content-Encoding"] = encoding
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(f"{etag}-{encoding}", weak)
+        return response
+
+
+compression = Compression()
@@ -0,0 +1,99 @@
+"""
+Respuestas y registro de errores con bajo costo por solicitud
+"""
+import logging
+from threading import Lock
+from time import monotonic
+from typing import Dict
+
+from flask import Response, current_app, jsonify
+
+from app.core.exceptions import BaseApiError
+
+
+def message_response(message: str, status_code: int) -> Response:
+    """Respuesta ``{"message": ...}`` cuyo cuerpo se serializa una sola vez"""
+    bodies: Dict[str, bytes] = current_app.extensions.setdefault("error_bodies", {})
+    body = bodies.get(message)
+    if body is None:
+        body = bodies[message] = current_app.json.response(message=message).get_data()
+    return current_app.response_class(
+        body, status=status_code, mimetype=current_app.json.mimetype
+    )
+
+
+def api_error_response(e: BaseApiError) -> Response:
+    """Respuesta del error; los errores sin mensaje ni payload propios usan cache"""
+    if e.is_static:
+        return message_response(e.message, e.status_code)
+    response = jsonify(e.to_dict())
+    response.status_code = e.status_code
+    return response
+
+
+class _Window:
+    __slots__ = ("start", "logged", "suppressed")
+
+    def __init__(self, start: float):
+        self.start = start
+        self.logged = 0
+        self.suppressed = 0
+
+
+class ErrorLog:
+    """Registra errores inesperados con un límite por clase de error
+
+    Se escriben a lo sumo ``limit`` registros por clase cada ``interval`` segundos;
+    el resto sólo se cuenta y se reporta en el siguiente registro. El traceback se
+    adjunta únicamente si el logger tiene habilitado el nivel ``DEBUG``.
+    """
+
+    def __init__(self, logger: logging.Logger, limit: int = 10, interval: float = 60):
+        self.logger = logger
+        self.limit = limit
+        self.interval = interval
+        self.counts: Dict[str, int] = {}
+        self.suppressed: Dict[str, int] = {}
+        self._windows: Dict[str, _Window] = {}
+        self._lock = Lock()
+
+    def log(
+        self, error: BaseException, message: str, level: int = logging.ERROR
+    ) -> None:
+        name = type(error).__name__
+        now = monotonic()
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+            window = self._windows.get(name)
+            if window is None or now - window.start >= self.interval:
+                pending = window.suppressed if window else 0
+                window = self._windows[name] = _Window(now)
+                window.suppressed = pending
+            if window.logged >= self.limit:
+                window.suppressed += 1
+                self.suppressed[name] = self.suppressed.get(name, 0) + 1
+                return
+            window.logged += 1
+            suppressed, window.suppressed = window.suppressed, 0
+
+        if not self.logger.isEnabledFor(level):
+            return
+        exc_info = error if self.logger.isEnabledFor(logging.DEBUG) else None
+        if suppressed:
+            message = f"{message} ({suppressed} similar errors suppressed)"
+        self.logger.log(
+            level,
+            "%s: %s: %s",
+            message,
+            name,
+            error,
+            exc_info=exc_info,
+            extra={"error": name, "suppressed": suppressed},
+        )
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                name: {"count": count, "suppressed": self.suppressed.get(name, 0)}
+                for name, count in self.counts.items()
+            }
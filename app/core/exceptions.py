@@ -15,11 +15,16 @@ class BaseApiError(Exception):
         self.payload = payload or {}
         super().__init__(self.message, *args)
 
+    @property
+    def is_static(self) -> bool:
+        """Indica si el error usa el mensaje y código de su clase, sin payload"""
+        return not (
+            self.payload or "message" in vars(self) or "status_code" in vars(self)
+        )
+
     def to_dict(self) -> dict:
         """Genera un diccionario con el mensaje y payload del error"""
-        data = self.payload
-        data["message"] = self.message
-        return data
+        return {**self.payload, "message": self.message}
 
 
 class NotAuthorizedError(BaseApiError):
@@ -48,3 +53,34 @@ class BadRequestError(BaseApiError):
 
     status_code = 400
     message = "Missing required fields or parameters"
+
+
+class ConflictError(BaseApiError):
+    """La solicitud entra en conflicto con el estado actual del recurso"""
+
+    status_code = 409
+    message = "Resource conflict"
+
+
+class TooManyRequestsError(BaseApiError):
+    """El cliente excedió el límite de solicitudes"""
+
+    status_code = 429
+    message = "Too many requests"
+
+    def __init__(self, *args, retry_after: int = 1, **kwargs):
+        """Reportar el exceso, indicando en segundos cuándo reintentar"""
+        self.retry_after = retry_after
+        super().__init__(*args, **kwargs)
+
+
+class ServiceUnavailableError(BaseApiError):
+    """El servicio está saturado temporalmente"""
+
+    status_code = 503
+    message = "Service temporarily unavailable"
+
+    def __init__(self, *args, retry_after: int = 1, **kwargs):
+        """Reportar saturación, indicando en segundos cuándo reintentar"""
+        self.retry_after = retry_after
+        super().__init__(*args, **kwargs)
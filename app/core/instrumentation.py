@@ -0,0 +1,141 @@
+"""
+Medición de consultas SQL por solicitud
+"""
+import logging
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from functools import lru_cache
+from time import perf_counter
+from typing import List, Optional, Tuple
+
+from flask import Flask, Response, current_app, g, has_app_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("app.sql")
+
+_NORMALIZE = (
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"%\(\w+\)s|%s|(?<![:\w]):[A-Za-z_]\w*|\$\d+"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)"), "(...)"),
+    (re.compile(r"(?:\(\.\.\.\)\s*,\s*)+\(\.\.\.\)"), "(...)"),
+    (re.compile(r"\s+"), " "),
+)
+
+
+class NPlusOneError(Exception):
+    """Una consulta se repitió demasiadas veces en una solicitud"""
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(statement: str) -> str:
+    """Normaliza la sentencia reemplazando literales y parámetros por ``?``"""
+    for pattern, replacement in _NORMALIZE:
+        statement = pattern.sub(replacement, statement)
+    return statement.strip()
+
+
+@dataclass
+class QueryStats:
+    """Consultas ejecutadas durante una solicitud y su tiempo acumulado"""
+
+    count: int = 0
+    time: float = 0.0
+    slow_ms: Optional[float] = None
+    fingerprints: Counter = field(default_factory=Counter)
+
+    def record(self, statement: str, elapsed: float) -> None:
+        self.count += 1
+        self.time += elapsed
+        key = fingerprint(statement)
+        self.fingerprints[key] += 1
+        if self.slow_ms is not None and elapsed * 1000 >= self.slow_ms:
+            logger.warning(
+                "Slow query (%.2fms): %s",
+                elapsed * 1000,
+                key,
+                extra={"sql": key, "duration_ms": round(elapsed * 1000, 2)},
+            )
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """Devuelve las consultas de lectura repetidas más de ``threshold`` veces"""
+        return [
+            (key, times)
+            for key, times in self.fingerprints.most_common()
+            if times > threshold and key.upper().startswith("SELECT")
+        ]
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    """Devuelve las estadísticas de la solicitud en curso o ``None``"""
+    if not has_app_context():
+        return None
+    return g.get("db_stats")
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info["query_start"].pop()
+    stats = current_query_stats()
+    if stats is not None:
+        stats.record(statement, perf_counter() - start)
+
+
+def _handle_error(exception_context):
+    starts = exception_context.connection and exception_context.connection.info.get(
+        "query_start"
+    )
+    if starts:
+        starts.pop()
+
+
+def init_query_stats(app: Flask) -> None:
+    """Registrar la medición de consultas para cada solicitud de la app
+
+    Además de contar consultas y tiempo, registra las consultas lentas
+    (``SQL_SLOW_QUERY_MS``), detecta patrones N+1 (``SQL_NPLUSONE_THRESHOLD``)
+    y agrega el encabezado ``Server-Timing`` si ``SQL_SERVER_TIMING`` está activo.
+    """
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+
+    @app.before_request
+    def reset_query_stats():
+        g.db_stats = QueryStats(slow_ms=current_app.config.get("SQL_SLOW_QUERY_MS"))
+        g.db_stats_start = perf_counter()
+
+    @app.after_request
+    def report_query_stats(response: Response) -> Response:
+        stats = current_query_stats()
+        if stats is None:
+            return response
+        config = current_app.config
+
+        if config.get("SQL_SERVER_TIMING", False):
+            total = (perf_counter() - g.db_stats_start) * 1000
+            response.headers.add(
+                "Server-Timing",
+                f'db;dur={stats.time * 1000:.2f};desc="{stats.count} queries", '
+                f"app;dur={total:.2f}",
+            )
+
+        threshold = config.get("SQL_NPLUSONE_THRESHOLD")
+        repeated = stats.repeated(threshold) if threshold else []
+        for key, times in repeated:
+            logger.warning(
+                "Possible N+1 query, repeated %d times: %s",
+                times,
+                key,
+                extra={"sql": key, "repeated": times},
+            )
+        if repeated and config.get("SQL_NPLUSONE_RAISE", False):
+            key, times = repeated[0]
+            raise NPlusOneError(f"Query repeated {times} times: {key}")
+        return response
@@ -0,0 +1,74 @@
+"""
+Proveedor JSON de la aplicación, con orjson si está instalado
+"""
+from datetime import date
+from typing import Any
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider, _default
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# Argumentos de ``json.dumps`` que orjson puede reproducir
+_SUPPORTED_KWARGS = {"default", "ensure_ascii", "sort_keys", "indent", "separators"}
+
+
+def _iso_default(o: Any) -> Any:
+    if isinstance(o, date):
+        return o.isoformat()
+    return _default(o)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Serializa con orjson y recurre a la librería estándar si no está disponible
+
+    UUID y dataclasses se serializan de forma nativa. Las fechas conservan el
+    formato HTTP de Flask salvo con ``JSON_DATETIME_FORMAT = "iso"``. A diferencia
+    del proveedor por defecto, orjson no escapa los caracteres no ASCII.
+    """
+
+    def __init__(self, app: Flask):
+        super().__init__(app)
+        self.use_orjson = orjson is not None and app.config.get("JSON_USE_ORJSON", True)
+        self.iso_dates = app.config.get("JSON_DATETIME_FORMAT", "http") == "iso"
+        if self.iso_dates:
+            self.default = _iso_default
+
+    def _options(self, kwargs: dict) -> int:
+        option = orjson.OPT_NON_STR_KEYS
+        if not self.iso_dates:
+            option |= orjson.OPT_PASSTHROUGH_DATETIME
+        if kwargs.get("sort_keys", self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get("indent"):
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if (
+            self.use_orjson
+            and kwargs.keys() <= _SUPPORTED_KWARGS
+            and kwargs.get("indent") in (None, 2)
+        ):
+            try:
+                return orjson.dumps(
+                    obj,
+                    default=kwargs.get("default", self.default),
+                    option=self._options(kwargs),
+                ).decode()
+            except orjson.JSONEncodeError:
+                # Enteros de más de 64 bits u otros tipos que sólo acepta ``json``
+                pass
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        if self.use_orjson and not kwargs:
+            try:
+                return orjson.loads(s)
+            except orjson.JSONDecodeError:
+                # Se repite con ``json`` para conservar su mensaje de error
+                pass
+        return super().loads(s, **kwargs)
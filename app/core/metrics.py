@@ -0,0 +1,404 @@
+"""
+Métricas de la aplicación en el formato de texto de Prometheus
+
+Cada proceso acumula sus métricas en memoria. Si se define
+``METRICS_MULTIPROC_DIR``, cada worker vuelca periódicamente su estado a un archivo
+en ese directorio y al exponerlas se suman los de todos los procesos.
+"""
+import atexit
+import json
+import os
+from bisect import bisect_left
+from glob import glob
+from threading import Lock
+from time import monotonic, perf_counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from flask import Flask, Response, current_app, g, request
+
+from app.core.pool import WAIT_BUCKETS, pool_stats
+from app.db import db
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+# Familia serializable: tipo, descripción, etiquetas y muestras por etiquetas.
+# Las muestras de un histograma son sus buckets acumulados y la suma.
+Family = dict
+Collector = Callable[[], Dict[str, Family]]
+
+
+class Metric:
+    """Métrica con etiquetas, segura entre hilos"""
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, object] = {}
+        self._lock = Lock()
+
+    def _key(self, labels: dict) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self) -> List[list]:
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def family(self) -> Family:
+        return {
+            "type": self.type,
+            "help": self.documentation,
+            "labels": list(self.labelnames),
+            "samples": self._samples(),
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, *args, buckets: Iterable[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0)
+            counts[bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def _samples(self) -> List[list]:
+        with self._lock:
+            return [
+                [list(key), {"buckets": _cumulative(counts), "sum": total}]
+                for key, (counts, total) in self._values.items()
+            ]
+
+    def family(self) -> Family:
+        return {**super().family(), "buckets": list(self.buckets)}
+
+
+def _cumulative(counts: Iterable[int]) -> List[int]:
+    result, running = [], 0
+    for count in counts:
+        running += count
+        result.append(running)
+    return result
+
+
+def merge(snapshots: Iterable[Tuple[bool, Dict[str, Family]]]) -> Dict[str, Family]:
+    """Suma las métricas de varios procesos
+
+    Cada elemento indica si el proceso sigue vivo; los gauges de procesos
+    terminados se descartan y sus contadores se conservan.
+    """
+    merged: Dict[str, Family] = {}
+    for alive, families in snapshots:
+        for name, family in families.items():
+            if family["type"] == "gauge" and not alive:
+                continue
+            target = merged.setdefault(name, {**family, "samples": {}})
+            samples = target["samples"]
+            for labels, value in family["samples"]:
+                key = tuple(labels)
+                if family["type"] != "histogram":
+                    samples[key] = samples.get(key, 0) + value
+                elif key not in samples:
+                    samples[key] = {
+                        "buckets": list(value["buckets"]),
+                        "sum": value["sum"],
+                    }
+                else:
+                    current = samples[key]
+                    current["buckets"] = [
+                        a + b for a, b in zip(current["buckets"], value["buckets"])
+                    ]
+                    current["sum"] += value["sum"]
+    for family in merged.values():
+        family["samples"] = [[list(k), v] for k, v in family["samples"].items()]
+    return merged
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return f"{{{pairs}}}" if pairs else ""
+
+
+def render(families: Dict[str, Family]) -> str:
+    """Genera el texto de exposición de Prometheus"""
+    lines = []
+    for name in sorted(families):
+        family = families[name]
+        lines.append(f"# HELP {name} {_escape(family['help'])}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        names = family["labels"]
+        for values, value in sorted(family["samples"], key=lambda s: s[0]):
+            if family["type"] != "histogram":
+                lines.append(f"{name}{_labels(names, values)} {_format_value(value)}")
+                continue
+            bounds = [*family["buckets"], float("inf")]
+            for bound, count in zip(bounds, value["buckets"]):
+                labels = _labels([*names, "le"], [*values, _format_value(bound)])
+                lines.append(f"{name}_bucket{labels} {_format_value(count)}")
+            labels = _labels(names, values)
+            lines.append(f"{name}_sum{labels} {_format_value(value['sum'])}")
+            lines.append(f"{name}_count{labels} {_format_value(value['buckets'][-1])}")
+    return "\n".join(lines) + "\n"
+
+
+def collect_pool_metrics() -> Dict[str, Family]:
+    """Estado del pool de conexiones de cada engine de la aplicación"""
+    gauges = {
+        "db_pool_size": ("size", "Configured pool size"),
+        "db_pool_idle": ("idle", "Idle connections in the pool"),
+        "db_pool_checked_out": ("checked_out", "Connections in use"),
+        "db_pool_overflow": ("overflow", "Connections opened over the pool size"),
+    }
+    counters = {
+        "db_pool_checkouts_total": ("checkouts", "Connection checkouts"),
+        "db_pool_timeouts_total": ("timeouts", "Checkouts that timed out"),
+        "db_pool_overflow_events_total": ("overflow_events", "Overflow connections"),
+    }
+    families = {
+        name: {"type": type_, "help": doc, "labels": ["bind"], "samples": []}
+        for type_, metrics in (("gauge", gauges), ("counter", counters))
+        for name, (_, doc) in metrics.items()
+    }
+    families["db_pool_wait_seconds"] = {
+        "type": "histogram",
+        "help": "Time waiting for a connection",
+        "labels": ["bind"],
+        "buckets": list(WAIT_BUCKETS),
+        "samples": [],
+    }
+
+    for bind, engine in db.engines.items():
+        bind = bind or "default"
+        stats = pool_stats(engine)
+        # ``QueuePool.overflow()`` es negativo mientras el pool no está lleno
+        if "overflow" in stats:
+            stats["overflow"] = max(stats["overflow"], 0)
+        for name, (key, _) in {**gauges, **counters}.items():
+            if key in stats:
+                families[name]["samples"].append([[bind], stats[key]])
+        if "wait_seconds" in stats:
+            wait = stats["wait_seconds"]
+            families["db_pool_wait_seconds"]["samples"].append(
+                [
+                    [bind],
+                    {"buckets": list(wait["buckets"].values()), "sum": wait["sum"]},
+                ]
+            )
+    return {name: family for name, family in families.items() if family["samples"]}
+
+
+class _MetricsState:
+    """Métricas de una aplicación y su archivo en modo multiproceso"""
+
+    def __init__(self, config: dict):
+        self.directory: Optional[str] = config["METRICS_MULTIPROC_DIR"]
+        self.flush_interval = config["METRICS_FLUSH_INTERVAL"]
+        self.collectors: List[Collector] = [collect_pool_metrics]
+        self.requests = Counter(
+            "http_requests_total",
+            "Requests handled",
+            ["endpoint", "method", "status"],
+        )
+        self.in_progress = Gauge("http_requests_in_progress", "Requests in progress")
+        self.latency = Histogram(
+            "http_request_duration_seconds",
+            "Request latency",
+            ["endpoint", "status"],
+            buckets=config["METRICS_LATENCY_BUCKETS"],
+        )
+        self.errors = Counter("http_errors_total", "Errors by class", ["error"])
+        self.metrics = [self.requests, self.in_progress, self.latency, self.errors]
+        self.pid = os.getpid()
+        self.last_flush = monotonic()
+        self._lock = Lock()
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.directory, f"metrics-{os.getpid()}.json")
+
+    def check_pid(self) -> None:
+        # Un worker creado con fork no debe repetir los valores del proceso padre
+        if self.pid != os.getpid():
+            for metric in self.metrics:
+                metric.reset()
+            self.pid = os.getpid()
+
+    def snapshot(self) -> Dict[str, Family]:
+        families = {metric.name: metric.family() for metric in self.metrics}
+        for collector in self.collectors:
+            families.update(collector())
+        return families
+
+    def flush(self, families: Dict[str, Family] = None) -> None:
+        """Escribir el estado del proceso en el directorio compartido"""
+        if not self.directory:
+            return
+        families = families if families is not None else self.snapshot()
+        with self._lock:
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w") as f:
+                json.dump({"pid": os.getpid(), "metrics": families}, f)
+            os.replace(tmp, self.path)
+            self.last_flush = monotonic()
+
+    def flush_if_due(self) -> None:
+        if self.directory and monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def collect(self) -> Dict[str, Family]:
+        """Devuelve las métricas del proceso o de todos los workers"""
+        families = self.snapshot()
+        if not self.directory:
+            return merge([(True, families)])
+        self.flush(families)
+        return merge(read_multiprocess_dir(self.directory))
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def read_multiprocess_dir(directory: str) -> List[Tuple[bool, Dict[str, Family]]]:
+    """Lee las métricas volcadas por cada proceso"""
+    snapshots = []
+    for path in glob(os.path.join(directory, "metrics-*.json")):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        snapshots.append((_pid_alive(data["pid"]), data["metrics"]))
+    return snapshots
+
+
+def clear_multiprocess_dir(directory: str) -> None:
+    """Eliminar los archivos de una ejecución anterior, al iniciar el servidor"""
+    for path in glob(os.path.join(directory, "metrics-*.json*")):
+        os.remove(path)
+
+
+class Metrics:
+    """Registra solicitudes, latencias y errores de la aplicación"""
+
+    extension_name = "metrics"
+
+    def __init__(self, app: Flask = None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        app.config.setdefault("METRICS_ENABLED", True)
+        app.config.setdefault("METRICS_PATH", "/metrics")
+        app.config.setdefault("METRICS_MULTIPROC_DIR", None)
+        app.config.setdefault("METRICS_FLUSH_INTERVAL", 1.0)
+        app.config.setdefault("METRICS_LATENCY_BUCKETS", DEFAULT_BUCKETS)
+        if not app.config["METRICS_ENABLED"]:
+            return
+
+        state = _MetricsState(app.config)
+        app.extensions[self.extension_name] = state
+        if state.directory:
+            os.makedirs(state.directory, exist_ok=True)
+
+            @atexit.register
+            def flush_at_exit():
+                with app.app_context():
+                    state.flush()
+
+        @app.before_request
+        def start_request_metrics():
+            state.check_pid()
+            state.in_progress.inc()
+            g.metrics_start = perf_counter()
+
+        @app.after_request
+        def record_request_metrics(response: Response) -> Response:
+            if "metrics_start" in g:
+                endpoint = request.endpoint or "unmatched"
+                status = response.status_code
+                state.requests.inc(
+                    endpoint=endpoint, method=request.method, status=status
+                )
+                state.latency.observe(
+                    perf_counter() - g.metrics_start, endpoint=endpoint, status=status
+                )
+            return response
+
+        @app.teardown_request
+        def finish_request_metrics(exception=None):
+            if "metrics_start" in g:
+                state.in_progress.dec()
+                state.flush_if_due()
+
+    @property
+    def state(self) -> Optional[_MetricsState]:
+        return current_app.extensions.get(self.extension_name)
+
+    def observe_error(self, error: Exception) -> None:
+        """Contar un error por el nombre de su clase"""
+        state = self.state
+        if state is not None:
+            state.errors.inc(error=type(error).__name__)
+
+    def render(self) -> str:
+        """Devuelve las métricas en el formato de texto de Prometheus"""
+        state = self.state
+        return render(state.collect()) if state is not None else ""
+
+
+metrics = Metrics()
@@ -0,0 +1,153 @@
+"""
+Configuración e instrumentación del pool de conexiones
+"""
+from bisect import bisect_left
+from threading import Lock
+from time import perf_counter
+
+from sqlalchemy import exc
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import NullPool, Pool, QueuePool
+
+# Límites superiores en segundos del histograma de espera por una conexión
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class PoolMetrics:
+    """Contadores de uso del pool"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.checked_out = 0
+        self.overflow_events = 0
+        self.timeouts = 0
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS) + 1)
+        self.wait_sum = 0.0
+        self._lock = Lock()
+
+    def observe_checkout(self, wait: float, overflowed: bool) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.overflow_events += overflowed
+            self.wait_sum += wait
+            self.wait_buckets[bisect_left(WAIT_BUCKETS, wait)] += 1
+
+    def observe_checkin(self) -> None:
+        with self._lock:
+            self.checked_out -= 1
+
+    def observe_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            cumulative, buckets = 0, {}
+            for bound, count in zip((*WAIT_BUCKETS, "+Inf"), self.wait_buckets):
+                cumulative += count
+                buckets[str(bound)] = cumulative
+            return {
+                "checkouts": self.checkouts,
+                "checked_out": self.checked_out,
+                "overflow_events": self.overflow_events,
+                "timeouts": self.timeouts,
+                "wait_seconds": {
+                    "count": self.checkouts,
+                    "sum": round(self.wait_sum, 6),
+                    "buckets": buckets,
+                },
+            }
+
+
+class InstrumentedPoolMixin:
+    """Mide el tiempo de espera por conexión y los eventos de overflow"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        overflow = self._current_overflow()
+        start = perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.observe_timeout()
+            raise
+        self.metrics.observe_checkout(
+            perf_counter() - start, self._current_overflow() > overflow
+        )
+        return conn
+
+    def _do_return_conn(self, record):
+        self.metrics.observe_checkin()
+        super()._do_return_conn(record)
+
+    def _current_overflow(self) -> int:
+        return 0
+
+
+class InstrumentedQueuePool(InstrumentedPoolMixin, QueuePool):
+    # Conservar el logger de SQLAlchemy en lugar de uno bajo ``app``
+    _sqla_logger_namespace = "sqlalchemy.pool.impl.QueuePool"
+
+    def _current_overflow(self) -> int:
+        return max(self.overflow(), 0)
+
+
+class InstrumentedNullPool(InstrumentedPoolMixin, NullPool):
+    _sqla_logger_namespace = "sqlalchemy.pool.impl.NullPool"
+
+
+POOL_CLASSES = {
+    "queue": InstrumentedQueuePool,
+    "null": InstrumentedNullPool,
+}
+
+
+def engine_options(config: dict) -> dict:
+    """Genera ``SQLALCHEMY_ENGINE_OPTIONS`` a partir de los ajustes del pool
+
+    Las opciones definidas explícitamente en ``SQLALCHEMY_ENGINE_OPTIONS`` tienen
+    prioridad. SQLite usa su propio pool y no se modifica.
+    """
+    options = dict(config.get("SQLALCHEMY_ENGINE_OPTIONS") or {})
+    uri = config.get("SQLALCHEMY_DATABASE_URI")
+    if not uri or make_url(uri).get_backend_name() == "sqlite":
+        return options
+
+    mode = config.get("SQLALCHEMY_POOL_MODE", "queue")
+    if mode not in POOL_CLASSES:
+        raise ValueError(f"Unknown SQLALCHEMY_POOL_MODE {mode!r}")
+
+    defaults = {
+        "poolclass": POOL_CLASSES[mode],
+        "pool_pre_ping": config.get("SQLALCHEMY_POOL_PRE_PING", True),
+    }
+    if mode == "queue":
+        defaults.update(
+            pool_size=config.get("SQLALCHEMY_POOL_SIZE", 5),
+            max_overflow=config.get("SQLALCHEMY_MAX_OVERFLOW", 10),
+            pool_timeout=config.get("SQLALCHEMY_POOL_TIMEOUT", 30),
+            pool_recycle=config.get("SQLALCHEMY_POOL_RECYCLE", 1800),
+            pool_use_lifo=config.get("SQLALCHEMY_POOL_USE_LIFO", False),
+        )
+    defaults.update(options)
+    return defaults
+
+
+def pool_stats(engine: Engine) -> dict:
+    """Devuelve el estado y las métricas del pool del engine"""
+    pool: Pool = engine.pool
+    stats = {"class": type(pool).__name__, "status": pool.status()}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            idle=pool.checkedin(),
+            overflow=pool.overflow(),
+        )
+    metrics = getattr(pool, "metrics", None)
+    if metrics is not None:
+        stats.update(metrics.to_dict())
+    return stats
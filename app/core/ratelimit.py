@@ -0,0 +1,219 @@
+"""
+Límite de solicitudes por cliente con almacenamiento intercambiable
+"""
+import math
+import re
+from dataclasses import dataclass
+from functools import lru_cache, wraps
+from threading import Lock
+from time import monotonic, time
+from typing import Callable, List, Optional, Tuple
+
+from flask import Flask, Response, current_app, g, request
+
+from app.core.cache import LRUCache
+from app.core.exceptions import TooManyRequestsError
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+_LIMIT = re.compile(r"^\s*(\d+)\s*/\s*(\d*)\s*(second|minute|hour|day)s?\s*$")
+
+
+@lru_cache(maxsize=64)
+def parse_limit(value: str) -> Tuple[int, int]:
+    """Convierte ``"5/minute"`` o ``"100/10 seconds"`` en ``(límite, segundos)``"""
+    match = _LIMIT.match(value)
+    if match is None:
+        raise ValueError(f"Invalid rate limit {value!r}")
+    amount, multiplier, unit = match.groups()
+    return int(amount), int(multiplier or 1) * _PERIODS[unit]
+
+
+@dataclass
+class RateLimitResult:
+    """Resultado de contar una solicitud contra un límite"""
+
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float
+    retry_after: float = 0.0
+
+
+class MemoryBackend:
+    """Token bucket en memoria, para un solo proceso
+
+    Cada llave tiene ``limit`` tokens que se recargan de forma continua durante
+    ``period`` segundos. Las llaves menos usadas se descartan al superar
+    ``maxsize``.
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self.buckets = LRUCache(maxsize=maxsize, ttl=None)
+        self._lock = Lock()
+
+    def hit(self, key: str, limit: int, period: float, cost: int = 1):
+        rate = limit / period
+        now = monotonic()
+        with self._lock:
+            tokens, updated = self.buckets.get(key) or (limit, now)
+            tokens = min(limit, tokens + (now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self.buckets.set(key, (tokens, now))
+        return RateLimitResult(
+            allowed=allowed,
+            limit=limit,
+            remaining=math.floor(tokens),
+            reset_after=(limit - tokens) / rate,
+            retry_after=0.0 if allowed else (cost - tokens) / rate,
+        )
+
+    def reset(self) -> None:
+        self.buckets.clear()
+
+
+class SharedBackend:
+    """Ventana deslizante en un almacenamiento compartido entre procesos
+
+    Sólo requiere ``incr``, ``expire`` y ``get`` de un cliente con la interfaz de
+    ``redis.Redis``. El conteo de la ventana actual se combina con el de la
+    anterior, ponderado por el tiempo que aún se superpone.
+    """
+
+    def __init__(self, client, prefix: str = "ratelimit"):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "SharedBackend":
+        try:
+            import redis
+        except ImportError:  # pragma: no cover
+            raise RuntimeError("The shared rate limit backend requires 'redis'")
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def hit(self, key: str, limit: int, period: float, cost: int = 1):
+        now = time()
+        window = int(now // period)
+        elapsed = now - window * period
+        current_key = f"{self.prefix}:{key}:{window}"
+
+        count = self.client.incr(current_key, cost)
+        if count == cost:
+            self.client.expire(current_key, int(period * 2))
+        previous = int(self.client.get(f"{self.prefix}:{key}:{window - 1}") or 0)
+
+        weight = 1 - elapsed / period
+        used = previous * weight + count
+        allowed = used <= limit
+        retry_after = 0.0
+        if not allowed:
+            retry_after = self._retry_after(limit, period, elapsed, previous, count)
+        return RateLimitResult(
+            allowed=allowed,
+            limit=limit,
+            remaining=max(0, math.floor(limit - used)),
+            reset_after=2 * period - elapsed,
+            retry_after=retry_after,
+        )
+
+    @staticmethod
+    def _retry_after(limit, period, elapsed, previous, count) -> float:
+        # Tiempo hasta que el peso de la ventana anterior deje lugar a una
+        # solicitud más; si la ventana actual ya está llena, se espera a la siguiente
+        if count + 1 <= limit and previous:
+            return max(0.0, period * (1 - (limit - count - 1) / previous) - elapsed)
+        return period - elapsed + period * max(0.0, 1 - (limit - 1) / count)
+
+
+class _LimiterState:
+    def __init__(self, config: dict):
+        storage = config["RATELIMIT_STORAGE"]
+        if storage == "memory":
+            self.backend = MemoryBackend(config["RATELIMIT_MEMORY_SIZE"])
+        elif storage == "shared":
+            self.backend = SharedBackend.from_url(config["RATELIMIT_STORAGE_URL"])
+        else:
+            raise ValueError(f"Unknown RATELIMIT_STORAGE {storage!r}")
+        self.rejected = 0
+
+
+def remote_address() -> Optional[str]:
+    """Llave por dirección IP del cliente"""
+    return request.remote_addr
+
+
+class RateLimiter:
+    """Limita las solicitudes a una vista por llaves como la IP o el usuario"""
+
+    extension_name = "rate_limiter"
+
+    def __init__(self, app: Flask = None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        app.config.setdefault("RATELIMIT_ENABLED", True)
+        app.config.setdefault("RATELIMIT_STORAGE", "memory")
+        app.config.setdefault("RATELIMIT_STORAGE_URL", None)
+        app.config.setdefault("RATELIMIT_MEMORY_SIZE", 10000)
+        app.config.setdefault("RATELIMIT_HEADERS", True)
+        app.extensions[self.extension_name] = _LimiterState(app.config)
+
+        @app.after_request
+        def add_rate_limit_headers(response: Response) -> Response:
+            results: List[RateLimitResult] = g.get("rate_limits")
+            if results and current_app.config["RATELIMIT_HEADERS"]:
+                # Se informa el límite más cercano a agotarse
+                result = min(results, key=lambda r: (r.allowed, r.remaining))
+                response.headers["X-RateLimit-Limit"] = str(result.limit)
+                response.headers["X-RateLimit-Remaining"] = str(result.remaining)
+                response.headers["X-RateLimit-Reset"] = str(
+                    math.ceil(result.reset_after)
+                )
+            return response
+
+    @property
+    def state(self) -> _LimiterState:
+        return current_app.extensions[self.extension_name]
+
+    def hit(self, scope: str, limit: str, key: str) -> RateLimitResult:
+        """Contar una solicitud y lanzar ``TooManyRequestsError`` si se excede"""
+        state = self.state
+        amount, period = parse_limit(limit)
+        result = state.backend.hit(f"{scope}:{key}", amount, period)
+        g.setdefault("rate_limits", []).append(result)
+        if not result.allowed:
+            state.rejected += 1
+            raise TooManyRequestsError(
+                retry_after=max(1, math.ceil(result.retry_after))
+            )
+        return result
+
+    def limit(self, scope: str, config_key: str, key_func: Callable = remote_address):
+        """Decorador que aplica el límite ``config_key`` antes de ejecutar la vista
+
+        ``key_func`` devuelve la llave de la solicitud; si es ``None`` el límite no
+        se aplica.
+        """
+
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                config = current_app.config
+                key = key_func() if config["RATELIMIT_ENABLED"] else None
+                limit = config.get(config_key)
+                if key is not None and limit:
+                    self.hit(scope, limit, key)
+                return view(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def stats(self) -> dict:
+        return {"rejected": self.state.rejected}
+
+
+rate_limiter = RateLimiter()
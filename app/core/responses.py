@@ -0,0 +1,29 @@
+from typing import Any, Callable, Iterable
+
+from flask import Response, current_app, stream_with_context
+
+
+def stream_json_array(
+    items: Iterable[Any], serialize: Callable[[Any], Any], chunk_size: int = 100
+) -> Response:
+    """Genera una respuesta que envía un arreglo JSON por partes
+
+    Los elementos se serializan y envían en bloques de ``chunk_size`` para que la
+    memoria no crezca con el tamaño del resultado.
+    """
+    dumps = current_app.json.dumps
+
+    def generate():
+        yield "["
+        chunk = []
+        first = True
+        for item in items:
+            chunk.append(dumps(serialize(item)))
+            if len(chunk) >= chunk_size:
+                yield ("" if first else ",") + ",".join(chunk)
+                chunk, first = [], False
+        if chunk:
+            yield ("" if first else ",") + ",".join(chunk)
+        yield "]"
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
@@ -0,0 +1,223 @@
+"""
+Serializadores precompilados a partir de esquemas de marshmallow
+
+``compile_schema`` recorre una sola vez los campos del esquema y arma una función
+específica para cada uno. Los campos o esquemas que no se pueden compilar (hooks,
+validadores de esquema, tipos desconocidos) se delegan a marshmallow.
+"""
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from weakref import WeakKeyDictionary
+
+from marshmallow import RAISE, Schema, ValidationError, fields as f, missing
+
+Serializer = Callable[[Any], Any]
+
+
+def _get_value(obj: Any, attr: str, default=missing) -> Any:
+    # Igual que ``marshmallow.utils.get_value`` para atributos sin puntos
+    if isinstance(obj, Mapping):
+        return obj.get(attr, default)
+    return getattr(obj, attr, default)
+
+
+def _overrides(obj: Any, base: type, method: str = "_serialize") -> bool:
+    return getattr(type(obj), method) is not getattr(base, method)
+
+
+def _value_serializer(field: f.Field) -> Optional[Serializer]:
+    """Función que formatea un valor ya obtenido, o ``None`` si no se soporta"""
+    if isinstance(field, f.String) and not _overrides(field, f.String):
+        return lambda value: None if value is None else str(value)
+
+    if isinstance(field, f.Boolean) and not _overrides(field, f.Boolean):
+        truthy, falsy = field.truthy, field.falsy
+
+        def serialize_bool(value):
+            if value is None:
+                return None
+            try:
+                if value in truthy:
+                    return True
+                if value in falsy:
+                    return False
+            except TypeError:
+                pass
+            return bool(value)
+
+        return serialize_bool
+
+    if type(field) in (f.Integer, f.Float) and not field.as_string:
+        cast = int if isinstance(field, f.Integer) else float
+        return lambda value: None if value is None else cast(value)
+
+    if isinstance(field, f.DateTime) and not _overrides(field, f.DateTime):
+        data_format = field.format or field.DEFAULT_FORMAT
+        format_func = field.SERIALIZATION_FUNCS.get(data_format)
+        if format_func is None:
+            return lambda value: None if value is None else value.strftime(data_format)
+        return lambda value: None if value is None else format_func(value)
+
+    if type(field) is f.List:
+        inner = _value_serializer(field.inner)
+        if inner is None:
+            return None
+        return lambda value: None if value is None else [inner(v) for v in value]
+
+    if type(field) is f.Pluck and not field.many:
+        nested = compile_schema(field.schema)
+        plucked = field.schema.fields[field.field_name]
+        if nested.dump_fallback or "." in (plucked.attribute or ""):
+            return None
+        serialize = _value_serializer(plucked)
+        if serialize is None:
+            return None
+        attr = plucked.attribute or field.field_name
+
+        def serialize_pluck(value):
+            if value is None:
+                return None
+            item = _get_value(value, attr)
+            if item is missing:
+                # marshmallow omite el campo y falla al leer la llave
+                raise KeyError(field.field_name)
+            return serialize(item)
+
+        return serialize_pluck
+
+    if type(field) is f.Nested:
+        nested = compile_schema(field.schema)
+        many = field.schema.many or field.many
+
+        def serialize_nested(value):
+            if value is None:
+                return None
+            return nested.dump(value, many=many)
+
+        return serialize_nested
+
+    return None
+
+
+class CompiledSchema:
+    """Versión compilada de un esquema con la misma salida que ``dump``/``load``"""
+
+    def __init__(self, schema: Schema):
+        self.schema = schema
+        self.many = schema.many
+        has_hooks = any(schema._hooks.values())
+        self.dump_fallback = has_hooks or _overrides(schema, Schema, "get_attribute")
+        self.load_fallback = has_hooks or schema.unknown != RAISE
+        self._dumpers: List[Tuple[str, str, str, Serializer, Any, f.Field]] = []
+        self._loaders: List[Tuple[str, str, f.Field]] = []
+        self._load_keys = set()
+        if not self.dump_fallback:
+            self._compile_dump()
+        if not self.load_fallback:
+            self._compile_load()
+
+    def _compile_dump(self) -> None:
+        for name, field in self.schema.dump_fields.items():
+            attr = field.attribute or name
+            key = field.data_key if field.data_key is not None else name
+            serialize = None
+            if field._CHECK_ATTRIBUTE and "." not in attr:
+                serialize = _value_serializer(field)
+            self._dumpers.append(
+                (key, name, attr, serialize, field.dump_default, field)
+            )
+
+    def _compile_load(self) -> None:
+        for name, field in self.schema.load_fields.items():
+            attr = field.attribute or name
+            if "." in attr:
+                self.load_fallback = True
+                return
+            key = field.data_key if field.data_key is not None else name
+            self._loaders.append((key, attr, field))
+            self._load_keys.add(key)
+
+    def _dump_one(self, obj: Any) -> dict:
+        result = {}
+        for key, name, attr, serialize, default, field in self._dumpers:
+            if serialize is None:
+                value = field.serialize(name, obj, accessor=self.schema.get_attribute)
+            else:
+                value = _get_value(obj, attr)
+                if value is missing:
+                    value = default() if callable(default) else default
+                if value is not missing:
+                    value = serialize(value)
+            if value is not missing:
+                result[key] = value
+        return result
+
+    def dump(self, obj: Any, *, many: Optional[bool] = None) -> Any:
+        """Equivalente a ``schema.dump``"""
+        many = self.many if many is None else many
+        if self.dump_fallback:
+            return self.schema.dump(obj, many=many)
+        if many:
+            return [self._dump_one(item) for item in obj]
+        return self._dump_one(obj)
+
+    def _load_one(self, data: Any, errors: Dict) -> dict:
+        if not isinstance(data, Mapping):
+            errors["_schema"] = [self.schema.error_messages["type"]]
+            return {}
+        result = {}
+        for key, attr, field in self._loaders:
+            raw = data.get(key, missing)
+            if raw is missing:
+                if field.required:
+                    errors[key] = [field.error_messages["required"]]
+                    continue
+                default = field.load_default
+                raw = default() if callable(default) else default
+                if raw is missing:
+                    continue
+                result[attr] = raw
+                continue
+            try:
+                result[attr] = field.deserialize(raw, key, data)
+            except ValidationError as e:
+                errors[key] = e.messages
+                if e.valid_data:
+                    result[attr] = e.valid_data
+        for key in data.keys() - self._load_keys:
+            errors[key] = [self.schema.error_messages["unknown"]]
+        return result
+
+    def load(self, data: Any, *, many: Optional[bool] = None, **kwargs) -> Any:
+        """Equivalente a ``schema.load``; ``partial``/``unknown`` usan marshmallow"""
+        many = self.many if many is None else many
+        if self.load_fallback or kwargs:
+            return self.schema.load(data, many=many, **kwargs)
+
+        errors: Dict = {}
+        if not many:
+            result = self._load_one(data, errors)
+        elif not isinstance(data, list):
+            errors["_schema"] = [self.schema.error_messages["type"]]
+            result = []
+        else:
+            result = []
+            for index, item in enumerate(data):
+                item_errors = {}
+                result.append(self._load_one(item, item_errors))
+                if item_errors:
+                    errors[index] = item_errors
+        if errors:
+            raise ValidationError(errors, data=data, valid_data=result)
+        return result
+
+
+_compiled: "WeakKeyDictionary[Schema, CompiledSchema]" = WeakKeyDictionary()
+
+
+def compile_schema(schema: Schema) -> CompiledSchema:
+    """Devuelve la versión compilada del esquema, generada una sola vez"""
+    compiled = _compiled.get(schema)
+    if compiled is None:
+        compiled = _compiled[schema] = CompiledSchema(schema)
+    return compiled
@@ -1,19 +1,236 @@
 """
 Inicializar ORM
 """
-from typing import TypeVar, Type, List
+import base64
+import json
+from contextlib import contextmanager
+from itertools import count
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, Generic, Iterator, TypeVar, Type, List, Optional, Sequence
+from uuid import UUID
 
+from flask import Flask, Response, current_app
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import select
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Select, event, inspect, select, tuple_
+from sqlalchemy.exc import DataError, IntegrityError, OperationalError, SQLAlchemyError
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.sql.base import ExecutableOption
+from sqlalchemy.sql.dml import UpdateBase
+
+from app.core.exceptions import (
+    BadRequestError,
+    ConflictError,
+    ServiceUnavailableError,
+)
 
 
 class Base(DeclarativeBase):
     pass
 
 
-db = SQLAlchemy(model_class=Base)
+class RoutingSession(Session):
+    """Sesión que envía las consultas de sólo lectura a las réplicas
+
+    Las réplicas son los binds listados en ``SQLALCHEMY_REPLICA_BINDS`` y se usan
+    por turnos. Las escrituras, ``SELECT ... FOR UPDATE`` y cualquier consulta
+    posterior a una escritura en la misma transacción van al primario.
+    """
+
+    _turn = count()
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if isinstance(clause, UpdateBase):
+            self.info["wrote"] = True
+        if bind is not None or not self._is_replica_read(clause):
+            return engine
+
+        engines = self._db.engines
+        if engine is not engines.get(None):
+            return engine
+        replicas = current_app.config.get("SQLALCHEMY_REPLICA_BINDS") or ()
+        if not replicas:
+            return engine
+        return engines[replicas[next(self._turn) % len(replicas)]]
+
+    def _is_replica_read(self, clause) -> bool:
+        return (
+            isinstance(clause, Select)
+            and clause._for_update_arg is None
+            and not self._flushing
+            and not self.info.get("use_primary")
+            and not self.info.get("wrote")
+        )
+
+
+db = SQLAlchemy(model_class=Base, session_options={"class_": RoutingSession})
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _mark_write(session, _flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def _reset_write(session, transaction):
+    if transaction.parent is None:
+        session.info.pop("wrote", None)
+
+
+@contextmanager
+def use_primary():
+    """Leer del primario dentro del bloque, p. ej. justo después de escribir"""
+    info = db.session.info
+    info["use_primary"] = info.get("use_primary", 0) + 1
+    try:
+        yield
+    finally:
+        info["use_primary"] -= 1
+
+
 T = TypeVar("T")
+LoadOptions = Optional[Sequence[ExecutableOption]]
+
+
+@dataclass
+class Page(Generic[T]):
+    """Página de resultados y cursor opaco hacia la siguiente"""
+
+    items: List[T]
+    next_cursor: Optional[str]
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Genera un cursor opaco con los valores de las columnas de orden"""
+    raw = json.dumps(list(values), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence[Any]) -> list:
+    """Devuelve los valores del cursor convertidos al tipo de cada columna"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError(cursor)
+        return [_coerce(column, value) for column, value in zip(columns, values)]
+    except ValueError:
+        raise BadRequestError("Invalid cursor")
+
+
+def map_db_error(error: SQLAlchemyError) -> Exception:
+    """Traduce errores de la db a la jerarquía de ``BaseApiError``"""
+    if isinstance(error, IntegrityError):
+        return ConflictError()
+    if isinstance(error, DataError):
+        return BadRequestError("Invalid value for the database")
+    if isinstance(error, OperationalError):
+        return ServiceUnavailableError("Database unavailable")
+    return error
+
+
+def in_transaction() -> bool:
+    """Indica si hay una unidad de trabajo abierta en la sesión actual"""
+    return db.session.info.get("uow_depth", 0) > 0
+
+
+def commit() -> None:
+    """Confirmar la sesión, revirtiéndola y traduciendo el error si falla"""
+    try:
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        raise map_db_error(e) from e
+
+
+@contextmanager
+def transaction():
+    """Agrupar operaciones en una unidad de trabajo
+
+    Dentro del bloque ``save()`` y ``delete()`` sólo registran los cambios, que se
+    confirman juntos al salir. Los bloques anidados usan un ``SAVEPOINT`` que se
+    revierte por separado si fallan.
+    """
+    session = db.session
+    depth = session.info.get("uow_depth", 0)
+    session.info["uow_depth"] = depth + 1
+    try:
+        if depth:
+            try:
+                with session.begin_nested():
+                    yield session
+            except SQLAlchemyError as e:
+                raise map_db_error(e) from e
+        else:
+            try:
+                yield session
+                session.flush()
+            except Exception as e:
+                session.rollback()
+                if isinstance(e, SQLAlchemyError):
+                    raise map_db_error(e) from e
+                raise
+            commit()
+    finally:
+        session.info["uow_depth"] = depth
+
+
+def register_request_transaction(app: Flask) -> None:
+    """Confirmar los cambios una sola vez al terminar cada solicitud
+
+    Se activa con ``SQLALCHEMY_REQUEST_TRANSACTION``. Las respuestas con error
+    revierten los cambios pendientes.
+    """
+    if not app.config.get("SQLALCHEMY_REQUEST_TRANSACTION", False):
+        return
+
+    @app.before_request
+    def begin_request_transaction():
+        db.session.info["uow_depth"] = 1
+
+    @app.after_request
+    def commit_request_transaction(response: Response) -> Response:
+        if not db.session.info.get("uow_depth"):
+            return response
+        db.session.info["uow_depth"] = 0
+        if response.status_code >= 400:
+            db.session.rollback()
+            return response
+        try:
+            commit()
+        except Exception as e:
+            return app.make_response(app.handle_user_exception(e))
+        return response
+
+    @app.teardown_request
+    def end_request_transaction(error=None):
+        if db.session.info.pop("uow_depth", 0):
+            db.session.rollback()
+
+
+def to_uuid(value: str | UUID) -> Optional[UUID]:
+    """Convierte el ID a ``UUID``, o ``None`` si no es válido"""
+    if isinstance(value, UUID):
+        return value
+    try:
+        return UUID(str(value))
+    except ValueError:
+        return None
+
+
+def _coerce(column, value):
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type is UUID:
+        return UUID(value)
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    return python_type(value)
 
 
 class BaseModel(db.Model):
@@ -22,16 +239,65 @@ class BaseModel(db.Model):
     __abstract__ = True
 
     def save(self):
-        """Guardar instancia en db"""
+        """Guardar instancia en db, o registrarla si hay una unidad de trabajo"""
         db.session.add(self)
-        db.session.commit()
+        if not in_transaction():
+            commit()
 
     def delete(self):
-        """Eliminar registro de la db"""
+        """Eliminar registro de la db, o registrarlo si hay una unidad de trabajo"""
         db.session.delete(self)
-        db.session.commit()
+        if not in_transaction():
+            commit()
+
+    @classmethod
+    def select(cls, *criteria, load: LoadOptions = None) -> Select:
+        """Genera una consulta del modelo con los filtros y opciones de carga
+
+        ``load`` recibe opciones como ``selectinload(Model.relacion)`` para cargar
+        relaciones en la misma ida a la db y evitar consultas N+1.
+        """
+        stmt = select(cls).where(*criteria)
+        if load:
+            stmt = stmt.options(*load)
+        return stmt
 
     @classmethod
-    def get_all(cls: Type[T]) -> List[T]:
+    def get_all(cls: Type[T], load: LoadOptions = None) -> List[T]:
         """Devuelve una lista con todos los elementos"""
-        return db.session.scalars(select(cls))
+        return db.session.scalars(cls.select(load=load))
+
+    @classmethod
+    def paginate_keyset(
+        cls: Type[T],
+        limit: int = 20,
+        cursor: str = None,
+        order_by: Sequence[Any] = None,
+        load: LoadOptions = None,
+    ) -> Page[T]:
+        """Devuelve una página ordenada por columnas indexadas (por defecto la PK)
+
+        En lugar de ``OFFSET`` se filtra por los valores del último elemento de la
+        página anterior, por lo que el costo no crece con el número de página.
+        """
+        columns = list(order_by or inspect(cls).primary_key)
+        stmt = cls.select(load=load).order_by(*columns).limit(limit + 1)
+        if cursor:
+            values = decode_cursor(cursor, columns)
+            stmt = stmt.where(tuple_(*columns) > tuple_(*values))
+
+        items = list(db.session.scalars(stmt))
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_cursor = encode_cursor([getattr(items[-1], c.key) for c in columns])
+        return Page(items=items, next_cursor=next_cursor)
+
+    @classmethod
+    def stream(
+        cls: Type[T], batch_size: int = 1000, load: LoadOptions = None
+    ) -> Iterator[T]:
+        """Itera todos los elementos cargándolos en lotes de ``batch_size``"""
+        columns = inspect(cls).primary_key
+        stmt = cls.select(load=load).order_by(*columns)
+        yield from db.session.scalars(stmt.execution_options(yield_per=batch_size))
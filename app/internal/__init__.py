@@ -0,0 +1,5 @@
+from flask import Blueprint
+
+internal = Blueprint("internal", __name__)
+
+from . import routes  # noqa: E402
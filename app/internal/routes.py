@@ -0,0 +1,44 @@
+from ipaddress import ip_address, ip_network
+
+from flask import Response, current_app, jsonify, request
+
+from app.core import metrics as core_metrics
+from app.core.exceptions import NotFoundError
+from app.core.pool import pool_stats
+from app.db import db
+from . import internal
+
+
+@internal.before_request
+def restrict_to_internal_networks():
+    """Ocultar los endpoints a clientes fuera de las redes permitidas"""
+    networks = current_app.config["INTERNAL_ALLOWED_NETWORKS"]
+    try:
+        address = ip_address(request.remote_addr or "")
+    except ValueError:
+        raise NotFoundError
+    if not any(address in ip_network(network) for network in networks):
+        raise NotFoundError
+
+
+@internal.get("/pool")
+def pool():
+    """Estado y métricas del pool de conexiones de cada engine"""
+    engines = {
+        bind or "default": pool_stats(engine) for bind, engine in db.engines.items()
+    }
+    return jsonify(engines)
+
+
+@internal.get("/errors")
+def errors():
+    """Errores inesperados registrados y suprimidos por clase"""
+    return jsonify(current_app.extensions["error_log"].stats())
+
+
+def metrics():
+    """Métricas en formato Prometheus; se registra en ``METRICS_PATH``"""
+    restrict_to_internal_networks()
+    return Response(
+        core_metrics.metrics.render(), content_type=core_metrics.CONTENT_TYPE
+    )
@@ -1,13 +1,259 @@
+import atexit
+import copy
+import json
+import logging
+import os
+import random
+import re
+from datetime import datetime, timezone
 from logging import Formatter, LogRecord
+from logging.handlers import QueueHandler, QueueListener
+from queue import Full, Queue
+from threading import Lock
+from time import perf_counter
+from typing import List
+from uuid import uuid4
 
-from flask import has_request_context, request
+from flask import Flask, Response, current_app, g, has_request_context, request
+
+from app.core.instrumentation import current_query_stats
+
+REQUEST_ID_HEADER = "X-Request-ID"
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,128}$")
+
+
+def add_request_context(record: LogRecord) -> None:
+    """Copiar al registro los datos de la solicitud en curso
+
+    Si el registro ya tiene el contexto (p. ej. capturado antes de encolarlo) no se
+    modifica.
+    """
+    if getattr(record, "has_request_context", False):
+        return
+    record.endpoint = None
+    record.method = None
+    record.request_id = None
+    if has_request_context():
+        record.endpoint = request.endpoint
+        record.method = request.method.upper()
+        record.request_id = g.get("request_id")
+    record.has_request_context = True
 
 
 class RequestFormatter(Formatter):
     def format(self, record: LogRecord) -> str:
-        record.endpoint = None
-        record.method = None
-        if has_request_context():
-            record.endpoint = request.endpoint
-            record.method = request.method.upper()
+        add_request_context(record)
         return super().format(record)
+
+
+# Atributos propios de ``LogRecord`` que no se copian como campos adicionales
+_RECORD_ATTRS = set(logging.makeLogRecord({}).__dict__) | {
+    "message",
+    "asctime",
+    "has_request_context",
+}
+
+
+class JSONFormatter(Formatter):
+    """Genera una línea JSON por registro con el contexto de la solicitud
+
+    Los valores pasados en ``extra`` se agregan como campos del objeto.
+    """
+
+    def format(self, record: LogRecord) -> str:
+        add_request_context(record)
+        data = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and value is not None:
+                data[key] = value
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exception"] = record.exc_text
+        return json.dumps(data, default=str)
+
+
+class AsyncQueueHandler(QueueHandler):
+    """Encola los registros para que un hilo aparte los escriba
+
+    ``handlers`` son los nombres de los handlers de ``LOGGING`` que reciben los
+    registros. La cola es acotada: si se llena los registros se descartan y se
+    cuentan en ``dropped`` en lugar de bloquear la solicitud.
+    """
+
+    def __init__(self, handlers: List[str], maxsize: int = 10000):
+        super().__init__(Queue(maxsize))
+        self.handler_names = list(handlers)
+        self.handlers: List[logging.Handler] = []
+        self.dropped = 0
+        # ``dictConfig`` configura los handlers en orden alfabético, por lo que se
+        # guarda su configuración para resolver los nombres al iniciar
+        configurator = getattr(handlers, "configurator", None)
+        self._handlers_config = configurator.config["handlers"] if configurator else {}
+        self._listener = None
+        self._pid = None
+        self._lock = Lock()
+        _queue_handlers.append(self)
+
+    def prepare(self, record: LogRecord) -> LogRecord:
+        # Se resuelve el mensaje en el hilo que lo genera, el formato se aplica
+        # después en el hilo del listener
+        add_request_context(record)
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            self.dropped += 1
+
+    def emit(self, record: LogRecord) -> None:
+        if self._pid != os.getpid():
+            self.start()
+        super().emit(record)
+
+    def start(self) -> None:
+        """Iniciar el listener; se reinicia si el proceso fue bifurcado"""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if not self.handlers:
+                self.handlers = [self._resolve(name) for name in self.handler_names]
+                self._handlers_config = {}
+            self._listener = QueueListener(
+                self.queue, *self.handlers, respect_handler_level=True
+            )
+            self._listener.start()
+            self._pid = os.getpid()
+
+    def stop(self) -> None:
+        """Escribir los registros pendientes y detener el listener"""
+        with self._lock:
+            if self._listener is not None and self._pid == os.getpid():
+                self._listener.stop()
+            self._listener = None
+            self._pid = None
+
+    def close(self) -> None:
+        self.stop()
+        if self in _queue_handlers:
+            _queue_handlers.remove(self)
+        super().close()
+
+    def _resolve(self, name: str) -> logging.Handler:
+        handler = self._handlers_config.get(name)
+        if isinstance(handler, logging.Handler):
+            return handler
+        # ``logging.getHandlerByName`` sólo existe desde Python 3.12
+        getter = getattr(logging, "getHandlerByName", None) or logging._handlers.get
+        handler = getter(name)
+        if handler is None:
+            raise ValueError(f"Unknown logging handler {name!r}")
+        return handler
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "queued": self.queue.qsize(),
+            "maxsize": self.queue.maxsize,
+            "dropped": self.dropped,
+        }
+
+
+_queue_handlers: List[AsyncQueueHandler] = []
+
+
+def start_queue_handlers() -> None:
+    """Iniciar los listeners de las colas configuradas"""
+    for handler in _queue_handlers:
+        handler.start()
+
+
+def queue_handlers_stats() -> List[dict]:
+    """Devuelve el estado de las colas de logging"""
+    return [handler.stats() for handler in _queue_handlers]
+
+
+@atexit.register
+def _stop_queue_handlers() -> None:
+    for handler in _queue_handlers:
+        handler.stop()
+
+
+def register_request_id(app: Flask) -> None:
+    """Asignar un ID a cada solicitud y devolverlo en la respuesta"""
+
+    @app.before_request
+    def assign_request_id():
+        request_id = request.headers.get(REQUEST_ID_HEADER, "")
+        if not _VALID_REQUEST_ID.match(request_id):
+            request_id = uuid4().hex
+        g.request_id = request_id
+
+    @app.after_request
+    def add_request_id_header(response: Response) -> Response:
+        if "request_id" in g:
+            response.headers[REQUEST_ID_HEADER] = g.request_id
+        return response
+
+
+access_logger = logging.getLogger("app.access")
+
+
+def register_access_log(app: Flask) -> None:
+    """Registrar cada solicitud con su latencia y uso de la db
+
+    Las solicitudes exitosas se muestrean con ``ACCESS_LOG_SAMPLE_RATE``; los
+    errores y las lentas (``ACCESS_LOG_SLOW_MS``) se registran siempre.
+    """
+    if not app.config.get("ACCESS_LOG_ENABLED", True):
+        return
+
+    @app.before_request
+    def start_timer():
+        g.request_start = perf_counter()
+
+    @app.after_request
+    def log_request(response: Response) -> Response:
+        if "request_start" not in g:
+            return response
+        latency_ms = (perf_counter() - g.request_start) * 1000
+        config = current_app.config
+        is_error = response.status_code >= config.get("ACCESS_LOG_ERROR_STATUS", 500)
+        is_slow = latency_ms >= config.get("ACCESS_LOG_SLOW_MS", 500)
+        if not (is_error or is_slow):
+            if random.random() >= config.get("ACCESS_LOG_SAMPLE_RATE", 1.0):
+                return response
+
+        stats = current_query_stats()
+        fields = {
+            "route": request.url_rule.rule if request.url_rule else None,
+            "status": response.status_code,
+            "latency_ms": round(latency_ms, 2),
+            "db_queries": stats.count if stats else 0,
+            "db_time_ms": round(stats.time * 1000, 2) if stats else 0.0,
+            "slow": is_slow,
+        }
+        level = (
+            logging.ERROR if is_error else logging.WARNING if is_slow else logging.INFO
+        )
+        access_logger.log(
+            level,
+            "%s %s %s %.2fms db=%d/%.2fms",
+            request.method,
+            request.path,
+            response.status_code,
+            latency_ms,
+            fields["db_queries"],
+            fields["db_time_ms"],
+            extra=fields,
+        )
+        return response
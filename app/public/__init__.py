@@ -2,4 +2,4 @@ from flask import Blueprint
 
 public = Blueprint("public", __name__)
 
-from . import routes  # noqa: E402
+from . import routes, commands  # noqa: F401,E402
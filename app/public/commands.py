@@ -0,0 +1,28 @@
+import click
+from flask import current_app
+
+from . import public
+from .media import media_files, precompress
+
+
+@public.cli.command("compress-media")
+@click.option("--min-size", type=int, help="Tamaño mínimo en bytes a comprimir")
+@click.option("--force", is_flag=True, help="Regenerar aunque estén al día")
+def compress_media_command(min_size, force):
+    """Generar las versiones .br/.gz de los archivos de MEDIA_ROOT"""
+    config = current_app.config
+    if min_size is None:
+        min_size = config["COMPRESS_MIN_SIZE"]
+
+    counts = precompress(
+        config["MEDIA_ROOT"],
+        config["MEDIA_PRECOMPRESS_EXTENSIONS"],
+        min_size=min_size,
+        force=force,
+    )
+    media_files.clear()
+
+    click.echo(
+        f"Written {counts['written']}, up to date {counts['skipped']}, "
+        f"removed {counts['removed']} compressed files"
+    )
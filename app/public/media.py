@@ -0,0 +1,269 @@
+"""
+Servicio de archivos de ``MEDIA_ROOT`` con cache de metadatos y respuestas
+condicionales
+"""
+import mimetypes
+import os
+import stat as st
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from time import monotonic
+from typing import Dict, Iterable, Optional, Tuple
+
+from flask import Flask, Response, current_app, request
+from werkzeug.exceptions import RequestedRangeNotSatisfiable
+from werkzeug.security import safe_join
+from werkzeug.wsgi import wrap_file
+
+from app.core.cache import LRUCache
+from app.core.compression import ENCODERS, SUFFIXES, compress, negotiate
+from app.core.exceptions import NotFoundError
+
+# Calidad máxima para los archivos precomprimidos, se generan una sola vez
+PRECOMPRESS_LEVELS = {"br": 11, "gzip": 9}
+
+
+@dataclass
+class FileInfo:
+    """Metadatos de un archivo y su contenido si es pequeño
+
+    ``variants`` son las versiones precomprimidas (``.br``, ``.gz``) por
+    codificación.
+    """
+
+    path: str
+    size: int
+    mtime_ns: int
+    etag: str
+    mimetype: str
+    cache_control: str
+    data: Optional[bytes] = None
+    encoding: Optional[str] = None
+    variants: Dict[str, "FileInfo"] = field(default_factory=dict)
+    version: Tuple = ()
+    checked_at: float = 0.0
+
+    @property
+    def last_modified(self) -> datetime:
+        return datetime.fromtimestamp(self.mtime_ns / 1e9, timezone.utc)
+
+
+class _MediaState:
+    def __init__(self, config: dict):
+        self.root = config["MEDIA_ROOT"]
+        self.cache = LRUCache(maxsize=config["MEDIA_CACHE_SIZE"], ttl=None)
+        self.check_interval = config["MEDIA_CACHE_CHECK_INTERVAL"]
+        self.max_data_size = config["MEDIA_CACHE_MAX_FILE_SIZE"]
+        self.cache_control = config["MEDIA_CACHE_CONTROL"]
+        self.default_cache_control = config["MEDIA_CACHE_CONTROL_DEFAULT"]
+        self.offload = config["MEDIA_OFFLOAD"]
+        self.accel_prefix = config["MEDIA_ACCEL_PREFIX"].rstrip("/")
+        if self.offload not in (None, "x-accel", "x-sendfile"):
+            raise ValueError(f"Unknown MEDIA_OFFLOAD {self.offload!r}")
+
+    @staticmethod
+    def version(path: str) -> Optional[Tuple]:
+        """``mtime`` y tamaño del archivo y de sus versiones precomprimidas
+
+        Devuelve ``None`` si el archivo no existe. Las versiones más antiguas que el
+        original se ignoran.
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if not st.S_ISREG(stat.st_mode):
+            return None
+        version = [(None, stat.st_mtime_ns, stat.st_size)]
+        for encoding, suffix in SUFFIXES.items():
+            try:
+                sibling = os.stat(path + suffix)
+            except OSError:
+                continue
+            if sibling.st_mtime_ns >= stat.st_mtime_ns:
+                version.append((encoding, sibling.st_mtime_ns, sibling.st_size))
+        return tuple(version)
+
+    def load(self, path: str, version: Tuple) -> FileInfo:
+        mimetype, file_encoding = mimetypes.guess_type(path)
+        if file_encoding or mimetype is None:
+            mimetype = "application/octet-stream"
+        extension = os.path.splitext(path)[1].lower()
+        cache_control = self.cache_control.get(extension, self.default_cache_control)
+
+        files = {}
+        for encoding, mtime_ns, size in version:
+            suffix = SUFFIXES.get(encoding, "")
+            data = None
+            if size <= self.max_data_size and not self.offload:
+                with open(path + suffix, "rb") as f:
+                    data = f.read()
+            files[encoding] = FileInfo(
+                path=path + suffix,
+                size=size,
+                mtime_ns=mtime_ns,
+                etag=f"{mtime_ns:x}-{size:x}{'-' + encoding if encoding else ''}",
+                mimetype=mimetype,
+                cache_control=cache_control,
+                data=data,
+                encoding=encoding,
+            )
+        info = files.pop(None)
+        info.variants = files
+        info.version = version
+        info.checked_at = monotonic()
+        return info
+
+
+class MediaFiles:
+    """Sirve archivos estáticos con ETag, ``Cache-Control`` por extensión y rangos
+
+    Los metadatos (y el contenido de los archivos pequeños) se guardan en un LRU;
+    cada entrada se valida contra el ``mtime`` del archivo como máximo una vez cada
+    ``MEDIA_CACHE_CHECK_INTERVAL`` segundos. Si existen versiones ``.br`` o ``.gz``
+    del archivo se envía la que acepte el cliente. Con ``MEDIA_OFFLOAD`` el envío
+    del archivo se delega al proxy mediante ``X-Accel-Redirect`` o ``X-Sendfile``.
+    """
+
+    extension_name = "media"
+
+    def __init__(self, app: Flask = None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        app.config.setdefault("MEDIA_CACHE_SIZE", 1024)
+        app.config.setdefault("MEDIA_CACHE_CHECK_INTERVAL", 2)
+        app.config.setdefault("MEDIA_CACHE_MAX_FILE_SIZE", 64 * 1024)
+        app.config.setdefault("MEDIA_CACHE_CONTROL", {})
+        app.config.setdefault("MEDIA_CACHE_CONTROL_DEFAULT", "public, max-age=3600")
+        app.config.setdefault("MEDIA_OFFLOAD", None)
+        app.config.setdefault("MEDIA_ACCEL_PREFIX", "/protected-media")
+        app.config.setdefault("MEDIA_PRECOMPRESS_EXTENSIONS", [])
+        app.extensions[self.extension_name] = _MediaState(app.config)
+
+    @property
+    def state(self) -> _MediaState:
+        return current_app.extensions[self.extension_name]
+
+    def get(self, file_path: str) -> FileInfo:
+        """Devuelve los metadatos del archivo o lanza ``NotFoundError``"""
+        state = self.state
+        info: Optional[FileInfo] = state.cache.get(file_path)
+        now = monotonic()
+        if info is not None and now - info.checked_at < state.check_interval:
+            return info
+
+        path = safe_join(state.root, file_path)
+        version = state.version(path) if path else None
+        if version is None:
+            state.cache.delete(file_path)
+            raise NotFoundError
+
+        if info is None or info.version != version:
+            info = state.load(path, version)
+            state.cache.set(file_path, info)
+        else:
+            info.checked_at = now
+        return info
+
+    def send(self, file_path: str) -> Response:
+        """Respuesta con el archivo, ``304`` si no cambió o ``206`` para rangos"""
+        state = self.state
+        info = self.get(file_path)
+        target = info
+        if info.variants:
+            target = info.variants.get(negotiate(info.variants), info)
+
+        response = current_app.response_class(mimetype=info.mimetype)
+        response.set_etag(target.etag)
+        response.last_modified = info.last_modified
+        response.headers["Cache-Control"] = info.cache_control
+        if info.variants:
+            response.vary.add("Accept-Encoding")
+        if target.encoding:
+            response.headers["Content-Encoding"] = target.encoding
+        # El cuerpo no se debe comprimir ni modificar después
+        response.direct_passthrough = True
+
+        if state.offload:
+            response.make_conditional(request)
+            if response.status_code == 200:
+                if state.offload == "x-accel":
+                    suffix = SUFFIXES.get(target.encoding, "")
+                    header = f"{state.accel_prefix}/{file_path}{suffix}"
+                    response.headers["X-Accel-Redirect"] = header
+                else:
+                    response.headers["X-Sendfile"] = target.path
+            return response
+
+        if target.data is not None:
+            response.set_data(target.data)
+        else:
+            response.response = wrap_file(request.environ, open(target.path, "rb"))
+            response.content_length = target.size
+        try:
+            return response.make_conditional(
+                request, accept_ranges=True, complete_length=target.size
+            )
+        except RequestedRangeNotSatisfiable:
+            response.close()
+            return current_app.response_class(
+                status=416, headers={"Content-Range": f"bytes */{target.size}"}
+            )
+
+    def clear(self) -> None:
+        self.state.cache.clear()
+
+
+def precompress(
+    root: str, extensions: Iterable[str], min_size: int = 0, force: bool = False
+) -> Dict[str, int]:
+    """Generar las versiones ``.br``/``.gz`` de los archivos de ``root``
+
+    Sólo se conservan las versiones más pequeñas que el original; las que ya están
+    al día se omiten salvo con ``force``.
+    """
+    extensions = {extension.lower() for extension in extensions}
+    counts = {"written": 0, "skipped": 0, "removed": 0}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(directory, name)
+            if os.path.splitext(name)[1].lower() not in extensions:
+                continue
+            stat = os.stat(path)
+            if stat.st_size < min_size:
+                continue
+            data = None
+            for encoding, suffix in SUFFIXES.items():
+                if encoding not in ENCODERS:
+                    continue
+                target = path + suffix
+                if not force and _is_fresh(target, stat):
+                    counts["skipped"] += 1
+                    continue
+                if data is None:
+                    with open(path, "rb") as f:
+                        data = f.read()
+                compressed = compress(data, encoding, PRECOMPRESS_LEVELS[encoding])
+                if len(compressed) >= len(data):
+                    if os.path.exists(target):
+                        os.remove(target)
+                        counts["removed"] += 1
+                    continue
+                tmp = f"{target}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(compressed)
+                os.replace(tmp, target)
+                counts["written"] += 1
+    return counts
+
+
+def _is_fresh(path: str, source: os.stat_result) -> bool:
+    try:
+        return os.stat(path).st_mtime_ns >= source.st_mtime_ns
+    except OSError:
+        return False
+
+
+media_files = MediaFiles()
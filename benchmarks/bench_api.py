@@ -0,0 +1,107 @@
+"""
+Micro-benchmarks de los endpoints de la API con ``app.test_client()``
+
+Mide la latencia dentro del proceso (sin red ni servidor) de cada escenario sobre
+la base de datos de ``config.benchmark``, sembrada con ``benchmarks.fixtures``.
+
+Uso:
+    python -m benchmarks.bench_api --seconds 5 --output benchmarks/results/api.json
+"""
+import argparse
+from time import perf_counter
+from typing import Callable, Dict, List, Tuple
+from uuid import uuid4
+
+from flask import Flask
+from flask.testing import FlaskClient
+
+from .common import create_bench_app, print_results, summarize, write_results
+from .fixtures import BENCH_PASSWORD, admin_email, seed
+
+# Cada escenario devuelve la función que envía una solicitud y el status esperado
+Scenario = Callable[[FlaskClient], Tuple[Callable[[], object], int]]
+
+
+def login_scenario(client: FlaskClient):
+    credentials = {"email": admin_email(0), "password": BENCH_PASSWORD}
+    return lambda: client.post("/login", json=credentials), 200
+
+
+def signup_scenario(client: FlaskClient):
+    def signup():
+        email = f"signup-{uuid4().hex}@bench.example.com"
+        return client.post("/signup", json={"email": email, "password": "secret"})
+
+    return signup, 201
+
+
+def authenticated(path: str) -> Scenario:
+    def scenario(client: FlaskClient):
+        response = client.post(
+            "/login", json={"email": admin_email(0), "password": BENCH_PASSWORD}
+        )
+        assert response.status_code == 200, response.get_data(as_text=True)
+        return lambda: client.get(path), 200
+
+    return scenario
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    "login": login_scenario,
+    "signup": signup_scenario,
+    "me": authenticated("/me"),
+    "protected": authenticated("/protected"),
+}
+
+
+def measure(app: Flask, name: str, seconds: float, warmup: int) -> dict:
+    """Ejecuta el escenario durante ``seconds`` y resume sus latencias"""
+    client = app.test_client()
+    send, expected = SCENARIOS[name](client)
+    for _ in range(warmup):
+        send()
+
+    latencies: List[float] = []
+    errors = 0
+    start = perf_counter()
+    while perf_counter() - start < seconds:
+        before = perf_counter()
+        response = send()
+        latencies.append(perf_counter() - before)
+        errors += response.status_code != expected
+    return summarize(name, latencies, perf_counter() - start, errors)
+
+
+def run(app: Flask, scenarios: List[str], seconds: float, warmup: int) -> List[dict]:
+    return [measure(app, name, seconds, warmup) for name in scenarios]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-uri", help="Por defecto BENCH_DATABASE_URI")
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS)
+    )
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--seed-users", type=int, default=0, help="Sembrar antes")
+    parser.add_argument("--output", help="Archivo JSON con los resultados")
+    args = parser.parse_args()
+
+    app = create_bench_app(args.database_uri)
+    if args.seed_users:
+        seed(app, users=args.seed_users)
+    results = run(app, args.scenarios, args.seconds, args.warmup)
+    print_results(results)
+    if args.output:
+        write_results(
+            args.output,
+            "api",
+            results,
+            database=app.config["SQLALCHEMY_DATABASE_URI"].split(":", 1)[0],
+            password_hash_method=app.config["PASSWORD_HASH_METHOD"],
+        )
+
+
+if __name__ == "__main__":
+    main()
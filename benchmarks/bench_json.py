@@ -0,0 +1,91 @@
+"""
+Benchmark de serialización JSON de listas de usuarios (proveedor por defecto vs orjson)
+
+Uso:
+    python -m benchmarks.bench_json --sizes 1 10 100 1000 --seconds 1
+"""
+import argparse
+import json
+from datetime import datetime
+from time import perf_counter
+from types import SimpleNamespace
+from uuid import uuid4
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from app.auth.schemas import UserSchema
+from app.core.json import FastJSONProvider
+
+
+def make_users(size: int) -> list:
+    """Genera la salida de ``UserSchema.dump`` para ``size`` usuarios"""
+    now = datetime.now()
+    roles = [SimpleNamespace(name="ADMINISTRATOR"), SimpleNamespace(name="USER")]
+    users = [
+        SimpleNamespace(
+            id=uuid4(),
+            email=f"user{i}@example.com",
+            is_active=True,
+            roles=roles,
+            created_at=now,
+            updated_at=now,
+        )
+        for i in range(size)
+    ]
+    return UserSchema(many=True).dump(users)
+
+
+def measure(dumps, data, seconds: float) -> float:
+    """Devuelve las serializaciones por segundo durante ``seconds``"""
+    dumps(data)
+    iterations, start = 0, perf_counter()
+    while (elapsed := perf_counter() - start) < seconds:
+        dumps(data)
+        iterations += 1
+    return iterations / elapsed
+
+
+def run(sizes, seconds: float) -> list:
+    app = Flask(__name__)
+    providers = {
+        "stdlib": DefaultJSONProvider(app),
+        "fast": FastJSONProvider(app),
+    }
+    results = []
+    for size in sizes:
+        data = make_users(size)
+        # Misma salida que la respuesta compacta de ``jsonify``
+        rates = {
+            name: measure(
+                lambda d: provider.dumps(d, separators=(",", ":")), data, seconds
+            )
+            for name, provider in providers.items()
+        }
+        results.append(
+            {
+                "size": size,
+                "fast_encoder": "orjson" if providers["fast"].use_orjson else "json",
+                **{f"{name}_dumps_per_sec": round(r, 1) for name, r in rates.items()},
+                **{
+                    f"{name}_users_per_sec": round(r * size, 1)
+                    for name, r in rates.items()
+                },
+                "speedup": round(rates["fast"] / rates["stdlib"], 2),
+            }
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--seconds", type=float, default=1.0)
+    args = parser.parse_args()
+
+    for result in run(args.sizes, args.seconds):
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
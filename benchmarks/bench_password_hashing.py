@@ -0,0 +1,69 @@
+"""
+Benchmark de verificación de contraseñas (logins por segundo por núcleo)
+
+Uso:
+    python -m benchmarks.bench_password_hashing --workers 4 --logins 200
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from flask import Flask
+
+from app.auth.hashing import PasswordHasher
+
+
+def run(method: str, workers: int, logins: int, concurrency: int) -> dict:
+    app = Flask(__name__)
+    app.config.update(
+        PASSWORD_HASH_METHOD=method,
+        PASSWORD_HASH_WORKERS=workers,
+        PASSWORD_HASH_QUEUE_SIZE=concurrency,
+        PASSWORD_HASH_TIMEOUT=60,
+    )
+    hasher = PasswordHasher(app)
+
+    def login(pwhash: str) -> bool:
+        with app.app_context():
+            return hasher.verify(pwhash, "benchmark")
+
+    with app.app_context():
+        pwhash = hasher.hash("benchmark")
+        # Calentar el pool para no medir el arranque de los procesos
+        hasher.verify(pwhash, "benchmark")
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = perf_counter()
+        results = list(pool.map(login, [pwhash] * logins))
+        elapsed = perf_counter() - start
+
+    with app.app_context():
+        hasher.shutdown()
+
+    assert all(results)
+    cores = max(workers, 1)
+    return {
+        "method": method,
+        "workers": workers,
+        "logins": logins,
+        "seconds": round(elapsed, 3),
+        "logins_per_sec": round(logins / elapsed, 2),
+        "logins_per_sec_per_core": round(logins / elapsed / cores, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--method", default="scrypt:32768:8:1")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.method, args.workers, args.logins, args.concurrency)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Utilidades compartidas por los benchmarks de la API
+"""
+import json
+import math
+import os
+import platform
+import subprocess
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional
+
+from flask import Flask
+
+from app import create_app
+
+PERCENTILES = (50, 95, 99)
+
+
+def create_bench_app(database_uri: Optional[str] = None) -> Flask:
+    """Instancia de la app con ``config.benchmark`` y la base de datos indicada"""
+    if database_uri:
+        os.environ["BENCH_DATABASE_URI"] = database_uri
+    return create_app("config.benchmark")
+
+
+def percentile(ordered: List[float], p: float) -> float:
+    """Percentil por el método del rango más cercano de una lista ordenada"""
+    if not ordered:
+        return 0.0
+    rank = min(max(math.ceil(p * len(ordered) / 100), 1), len(ordered))
+    return ordered[rank - 1]
+
+
+def summarize(
+    name: str, latencies: Iterable[float], elapsed: float, errors: int = 0, **extra
+) -> dict:
+    """Resumen de un escenario con latencias en segundos"""
+    ordered = sorted(latencies)
+    count = len(ordered)
+    result = {
+        "scenario": name,
+        "requests": count,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "requests_per_sec": round(count / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(sum(ordered) / count * 1000, 3) if count else 0.0,
+    }
+    for p in PERCENTILES:
+        result[f"p{p}_ms"] = round(percentile(ordered, p) * 1000, 3)
+    result["max_ms"] = round(ordered[-1] * 1000, 3) if count else 0.0
+    result.update(extra)
+    return result
+
+
+def git_revision() -> Optional[str]:
+    try:
+        output = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.stdout.strip() or None
+
+
+def write_results(path: str, benchmark: str, results: List[dict], **meta) -> dict:
+    """Guarda los resultados con los datos necesarios para compararlos"""
+    document = {
+        "benchmark": benchmark,
+        "revision": git_revision(),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        **meta,
+        "results": results,
+    }
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(document, f, indent=2)
+        f.write("\n")
+    return document
+
+
+def print_results(results: List[dict]) -> None:
+    for result in results:
+        print(json.dumps(result))
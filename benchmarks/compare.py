@@ -0,0 +1,65 @@
+"""
+Compara dos archivos de resultados de ``bench_api`` o ``load``
+
+Muestra la variación de req/s y de los percentiles por escenario y termina con
+código 1 si algún escenario empeora más que ``--threshold`` (en porcentaje).
+
+Uso:
+    python -m benchmarks.compare results/base.json results/head.json --threshold 10
+"""
+import argparse
+import json
+import sys
+from typing import List
+
+# Métricas comparadas y si un valor mayor es mejor
+METRICS = {
+    "requests_per_sec": True,
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+}
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        document = json.load(f)
+    return {result["scenario"]: result for result in document["results"]}
+
+
+def compare(base: dict, head: dict, threshold: float) -> List[dict]:
+    """Variación porcentual de cada métrica de los escenarios en común"""
+    rows = []
+    for scenario in base.keys() & head.keys():
+        for metric, higher_is_better in METRICS.items():
+            before, after = base[scenario][metric], head[scenario][metric]
+            change = (after - before) / before * 100 if before else 0.0
+            worse = -change if higher_is_better else change
+            rows.append(
+                {
+                    "scenario": scenario,
+                    "metric": metric,
+                    "base": before,
+                    "head": after,
+                    "change_pct": round(change, 1),
+                    "regression": worse > threshold,
+                }
+            )
+    return sorted(rows, key=lambda row: row["scenario"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=10.0)
+    args = parser.parse_args()
+
+    rows = compare(load(args.base), load(args.head), args.threshold)
+    for row in rows:
+        print(json.dumps(row))
+    sys.exit(1 if any(row["regression"] for row in rows) else 0)
+
+
+if __name__ == "__main__":
+    main()
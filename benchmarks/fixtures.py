@@ -0,0 +1,130 @@
+"""
+Datos de prueba para los benchmarks: roles y usuarios en volúmenes realistas
+
+Todos los usuarios comparten la contraseña ``BENCH_PASSWORD``; el hash se genera
+una sola vez para que la carga no dependa del costo del hashing.
+
+Uso:
+    python -m benchmarks.fixtures --users 10000 --admins 100 --roles 20
+"""
+import argparse
+import json
+import random
+from datetime import datetime, timedelta
+from time import perf_counter
+from uuid import uuid4
+
+import sqlalchemy as sa
+from flask import Flask
+
+from app.auth.hashing import password_hasher
+from app.auth.models import Role, User, user_role
+from app.db import db
+from .common import create_bench_app
+
+BENCH_PASSWORD = "benchmark-password"
+ADMIN_ROLE = "ADMINISTRATOR"
+USER_ROLE = "USER"
+BATCH_SIZE = 1000
+
+
+def user_email(index: int) -> str:
+    return f"user{index}@bench.example.com"
+
+
+def admin_email(index: int) -> str:
+    return f"admin{index}@bench.example.com"
+
+
+def _insert(table, rows: list) -> None:
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.session.execute(sa.insert(table), rows[start : start + BATCH_SIZE])
+
+
+def seed(
+    app: Flask,
+    users: int = 1000,
+    admins: int = 10,
+    roles: int = 10,
+    max_roles: int = 3,
+    reset: bool = True,
+    random_seed: int = 0,
+) -> dict:
+    """Crear ``admins`` administradores y ``users`` usuarios con roles al azar
+
+    Además de ``ADMINISTRATOR`` y ``USER`` se crean ``roles`` roles extra; cada
+    usuario recibe ``USER`` y hasta ``max_roles - 1`` de los extra.
+    """
+    rng = random.Random(random_seed)
+    start = perf_counter()
+    with app.app_context():
+        if reset:
+            db.drop_all()
+        db.create_all()
+
+        now = datetime.now()
+        role_rows = [
+            {"id": uuid4(), "name": name, "title": name.title(), "created_at": now}
+            for name in (ADMIN_ROLE, USER_ROLE, *(f"ROLE_{i}" for i in range(roles)))
+        ]
+        _insert(Role.__table__, role_rows)
+        admin_id, user_id, *extra_ids = [row["id"] for row in role_rows]
+
+        pwhash = password_hasher.hash(BENCH_PASSWORD)
+        user_rows, links = [], []
+        emails = [admin_email(i) for i in range(admins)]
+        emails += [user_email(i) for i in range(users)]
+        for index, email in enumerate(emails):
+            row_id = uuid4()
+            user_rows.append(
+                {
+                    "id": row_id,
+                    "email": email,
+                    "password": pwhash,
+                    "is_active": index < admins or rng.random() > 0.02,
+                    "created_at": now - timedelta(minutes=len(emails) - index),
+                }
+            )
+            granted = {user_id}
+            if index < admins:
+                granted.add(admin_id)
+            if extra_ids and max_roles > 1:
+                count = rng.randint(0, min(max_roles - 1, len(extra_ids)))
+                granted.update(rng.sample(extra_ids, count))
+            links.extend({"user_id": row_id, "role_id": r} for r in granted)
+
+        _insert(User.__table__, user_rows)
+        _insert(user_role, links)
+        db.session.commit()
+
+    return {
+        "users": users,
+        "admins": admins,
+        "roles": len(role_rows),
+        "user_roles": len(links),
+        "seconds": round(perf_counter() - start, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-uri", help="Por defecto BENCH_DATABASE_URI")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--admins", type=int, default=100)
+    parser.add_argument("--roles", type=int, default=20)
+    parser.add_argument("--max-roles", type=int, default=3)
+    args = parser.parse_args()
+
+    app = create_bench_app(args.database_uri)
+    result = seed(
+        app,
+        users=args.users,
+        admins=args.admins,
+        roles=args.roles,
+        max_roles=args.max_roles,
+    )
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
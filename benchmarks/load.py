@@ -0,0 +1,235 @@
+"""
+Generador de carga HTTP con varios procesos (latencias p50/p95/p99 y req/s)
+
+Sin ``--url`` levanta la app con ``config.benchmark`` en un servidor local de
+werkzeug; para medir la configuración real usar ``--url`` contra gunicorn.
+
+Uso:
+    python -m benchmarks.load --scenario me --processes 4 --connections 8
+    python -m benchmarks.load --url http://127.0.0.1:8000 --scenario login
+"""
+import argparse
+import json
+import logging
+import multiprocessing as mp
+import signal
+import socket
+import sys
+import threading
+from http.client import HTTPConnection
+from http.cookies import SimpleCookie
+from time import perf_counter, sleep, time
+from typing import List, Optional, Tuple
+from urllib.parse import urlsplit
+from uuid import uuid4
+
+from app.auth.hashing import password_hasher
+from .common import create_bench_app, print_results, summarize, write_results
+from .fixtures import BENCH_PASSWORD, admin_email, user_email
+
+SCENARIOS = ("login", "signup", "me", "protected")
+
+
+class Client:
+    """Conexión persistente con las cookies de la sesión"""
+
+    def __init__(self, url: str):
+        parts = urlsplit(url)
+        self.connection = HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+        self.prefix = parts.path.rstrip("/")
+        self.cookies = SimpleCookie()
+
+    def request(self, method: str, path: str, body: Optional[dict] = None) -> int:
+        headers = {"Accept-Encoding": "gzip"}
+        if self.cookies:
+            headers["Cookie"] = "; ".join(
+                f"{name}={morsel.value}" for name, morsel in self.cookies.items()
+            )
+        data = None
+        if body is not None:
+            data = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+        self.connection.request(method, self.prefix + path, data, headers)
+        response = self.connection.getresponse()
+        response.read()
+        for cookie in response.headers.get_all("Set-Cookie") or []:
+            self.cookies.load(cookie)
+        return response.status
+
+    def login(self, email: str) -> int:
+        return self.request(
+            "POST", "/login", {"email": email, "password": BENCH_PASSWORD}
+        )
+
+
+def _requester(client: Client, scenario: str, user: int):
+    email = admin_email(0) if scenario == "protected" else user_email(user)
+    if scenario == "login":
+        return lambda: client.login(email), 200
+    if scenario == "signup":
+
+        def signup():
+            email = f"load-{uuid4().hex}@bench.example.com"
+            return client.request("POST", "/signup", {"email": email, "password": "x"})
+
+        return signup, 201
+
+    status = client.login(email)
+    if status != 200:
+        raise RuntimeError(f"Login failed for {email} with status {status}")
+    path = "/me" if scenario == "me" else "/protected"
+    return lambda: client.request("GET", path), 200
+
+
+def worker(
+    url: str,
+    scenario: str,
+    users: List[int],
+    start_at: float,
+    until: float,
+) -> Tuple[List[float], int]:
+    """Proceso de carga: un hilo con su propia conexión por cada usuario"""
+    results = []
+
+    def connection(user: int):
+        latencies, errors = [], 0
+        send, expected = _requester(Client(url), scenario, user)
+        sleep(max(start_at - time(), 0))
+        while time() < until:
+            before = perf_counter()
+            try:
+                ok = send() == expected
+            except OSError:
+                ok = False
+            latencies.append(perf_counter() - before)
+            errors += not ok
+        results.append((latencies, errors))
+
+    threads = [threading.Thread(target=connection, args=(user,)) for user in users]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies = [latency for items, _ in results for latency in items]
+    return latencies, sum(errors for _, errors in results)
+
+
+def run(
+    url: str,
+    scenario: str,
+    processes: int,
+    connections: int,
+    duration: float,
+    users: int = 1000,
+) -> dict:
+    """Ejecuta el escenario con ``processes * connections`` conexiones
+
+    Cada conexión inicia sesión con uno de los primeros ``users`` usuarios de
+    ``benchmarks.fixtures``.
+    """
+    ctx = mp.get_context("spawn")
+    # Margen para que todos los procesos inicien e inicien sesión
+    start_at = time() + 2 + processes * 0.2
+    until = start_at + duration
+    args = [
+        (
+            url,
+            scenario,
+            [(p * connections + c) % users for c in range(connections)],
+            start_at,
+            until,
+        )
+        for p in range(processes)
+    ]
+    with ctx.Pool(processes) as pool:
+        outputs = pool.starmap(worker, args)
+
+    latencies: List[float] = [value for items, _ in outputs for value in items]
+    errors = sum(errors for _, errors in outputs)
+    return summarize(
+        scenario,
+        latencies,
+        duration,
+        errors,
+        processes=processes,
+        connections=processes * connections,
+    )
+
+
+def serve(port: int, database_uri: Optional[str]) -> None:
+    from werkzeug.serving import make_server
+
+    app = create_bench_app(database_uri)
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        make_server("127.0.0.1", port, app, threaded=True).serve_forever()
+    finally:
+        # Cerrar el pool de hashing para no dejar procesos huérfanos
+        with app.app_context():
+            password_hasher.shutdown()
+
+
+def start_server(database_uri: Optional[str]):
+    """Levanta la app en un proceso aparte y devuelve el proceso y su URL"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    # No es daemon: el hashing de contraseñas usa su propio pool de procesos
+    process = mp.get_context("spawn").Process(target=serve, args=(port, database_uri))
+    process.start()
+    deadline = time() + 30
+    while time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return process, f"http://127.0.0.1:{port}"
+        except OSError:
+            sleep(0.1)
+    process.terminate()
+    raise RuntimeError("The benchmark server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="Servidor a medir, por defecto uno local")
+    parser.add_argument("--database-uri", help="Base de datos del servidor local")
+    parser.add_argument("--scenario", choices=SCENARIOS, nargs="+", default=["me"])
+    parser.add_argument("--processes", type=int, default=mp.cpu_count())
+    parser.add_argument("--connections", type=int, default=4, help="Por proceso")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--users", type=int, default=1000, help="Usuarios sembrados")
+    parser.add_argument("--output", help="Archivo JSON con los resultados")
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        server, url = start_server(args.database_uri)
+    try:
+        results = [
+            run(
+                url,
+                scenario,
+                args.processes,
+                args.connections,
+                args.duration,
+                args.users,
+            )
+            for scenario in args.scenario
+        ]
+    finally:
+        if server is not None:
+            server.terminate()
+            server.join()
+
+    print_results(results)
+    if args.output:
+        write_results(
+            args.output, "load", results, url=args.url or "local werkzeug server"
+        )
+
+
+if __name__ == "__main__":
+    main()
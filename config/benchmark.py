@@ -0,0 +1,18 @@
+import os
+
+from .default import *
+
+APP_ENV = APP_ENV_LOCAL
+DEBUG = False
+
+# SQLite local por defecto; para Postgres usar BENCH_DATABASE_URI
+SQLALCHEMY_DATABASE_URI = os.getenv(
+    "BENCH_DATABASE_URI", "sqlite:///" + join(BASE_DIR, "instance", "benchmark.db")
+)
+
+# Sin límites de intentos ni trabajo extra por solicitud
+RATELIMIT_ENABLED = False
+SQL_SERVER_TIMING = False
+ACCESS_LOG_ENABLED = False
+LOGGING["loggers"]["app"]["level"] = "WARNING"
+LOGGING["loggers"]["app"]["handlers"] = ["console"]
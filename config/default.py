@@ -4,18 +4,112 @@ BASE_DIR = dirname(dirname(abspath(__file__)))
 MEDIA_ROOT = join(BASE_DIR, "media")
 LOGS_ROOT = join(BASE_DIR, "logs")
 
+# Archivos de MEDIA_ROOT: cache de metadatos y de archivos pequeños (bytes)
+MEDIA_CACHE_SIZE = 1024
+MEDIA_CACHE_CHECK_INTERVAL = 2
+MEDIA_CACHE_MAX_FILE_SIZE = 64 * 1024
+MEDIA_CACHE_CONTROL_DEFAULT = "public, max-age=3600"
+MEDIA_CACHE_CONTROL = {
+    ".css": "public, max-age=86400",
+    ".js": "public, max-age=86400",
+    ".jpg": "public, max-age=604800",
+    ".jpeg": "public, max-age=604800",
+    ".png": "public, max-age=604800",
+    ".gif": "public, max-age=604800",
+    ".webp": "public, max-age=604800",
+    ".svg": "public, max-age=604800",
+    ".woff2": "public, max-age=31536000, immutable",
+    ".pdf": "public, max-age=3600",
+}
+# Archivos para los que "flask public compress-media" genera versiones .br/.gz
+MEDIA_PRECOMPRESS_EXTENSIONS = [".css", ".js", ".json", ".svg", ".txt", ".html"]
+# Delegar el envío al proxy: None, "x-accel" (nginx) o "x-sendfile" (Apache)
+MEDIA_OFFLOAD = None
+MEDIA_ACCEL_PREFIX = "/protected-media"
+
 SECRET_KEY = "supersecret"
 TESTING = False
 DEBUG = True
 
 # SQLAlchemy
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+# Confirmar los cambios una sola vez al final de cada solicitud
+SQLALCHEMY_REQUEST_TRANSACTION = False
+
+# Serialización JSON con orjson si está instalado; fechas en formato "http" o "iso"
+JSON_USE_ORJSON = True
+JSON_DATETIME_FORMAT = "http"
+
+# Compresión de respuestas JSON (brotli sólo si el paquete está instalado)
+COMPRESS_ENABLED = True
+COMPRESS_MIMETYPES = ["application/json"]
+COMPRESS_MIN_SIZE = 1024
+COMPRESS_GZIP_LEVEL = 6
+COMPRESS_BR_LEVEL = 4
+
+# Instrumentación de consultas SQL
+SQL_SLOW_QUERY_MS = 100
+SQL_NPLUSONE_THRESHOLD = 10
+SQL_NPLUSONE_RAISE = False
+SQL_SERVER_TIMING = DEBUG
+
+# Réplicas de lectura: nombres de binds definidos en SQLALCHEMY_BINDS
+SQLALCHEMY_REPLICA_BINDS = []
+
+# Pool de conexiones ("queue" o "null" para usar detrás de PgBouncer)
+SQLALCHEMY_POOL_MODE = "queue"
+SQLALCHEMY_POOL_SIZE = 5
+SQLALCHEMY_MAX_OVERFLOW = 10
+SQLALCHEMY_POOL_TIMEOUT = 30
+SQLALCHEMY_POOL_RECYCLE = 1800
+SQLALCHEMY_POOL_PRE_PING = True
+SQLALCHEMY_POOL_USE_LIFO = False
+
+# Endpoints internos (métricas), sólo accesibles desde las redes permitidas
+INTERNAL_ENDPOINTS_ENABLED = True
+INTERNAL_URL_PREFIX = "/_internal"
+INTERNAL_ALLOWED_NETWORKS = ["127.0.0.0/8", "::1/128"]
+
+# Métricas en formato Prometheus. Con varios workers (gunicorn) cada proceso
+# escribe sus métricas en METRICS_MULTIPROC_DIR, que debe vaciarse al iniciar
+METRICS_ENABLED = True
+METRICS_PATH = "/metrics"
+METRICS_MULTIPROC_DIR = None
+METRICS_FLUSH_INTERVAL = 1.0
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Paginación y exportación de listados
+PAGINATION_DEFAULT_LIMIT = 20
+PAGINATION_MAX_LIMIT = 100
+EXPORT_BATCH_SIZE = 1000
+BULK_IMPORT_CHUNK_SIZE = 1000
 
 # JWT
 JWT_SECRET_KEY = "ultra-secret"
 JWT_TOKEN_LOCATION = ["cookies"]
 JWT_COOKIE_SECURE = False
 
+# Cache de identidad (usuarios autenticados y sus roles)
+AUTH_IDENTITY_CACHE_SIZE = 1024
+AUTH_IDENTITY_CACHE_TTL = 60
+
+# Hashing de contraseñas (método y costo en formato de werkzeug)
+PASSWORD_HASH_METHOD = "scrypt:32768:8:1"
+PASSWORD_HASH_WORKERS = 2
+PASSWORD_HASH_QUEUE_SIZE = 32
+PASSWORD_HASH_TIMEOUT = 10
+PASSWORD_HASH_RETRY_AFTER = 1
+
+# Límite de intentos de inicio de sesión ("memory" o "shared" con Redis)
+RATELIMIT_ENABLED = True
+RATELIMIT_STORAGE = "memory"
+RATELIMIT_STORAGE_URL = None
+RATELIMIT_LOGIN_IP = "20/minute"
+RATELIMIT_LOGIN_EMAIL = "5/minute"
+
+# Incluir los roles del usuario en el access token
+AUTH_ROLE_CLAIMS = False
+
 # Environments
 APP_ENV_DEVELOPMENT = "development"
 APP_ENV_TESTING = "testing"
@@ -24,6 +118,16 @@ APP_ENV_PRODUCTION = "production"
 APP_ENV_LOCAL = "local"
 APP_ENV = ""
 
+# Errores inesperados: registros por clase de error cada intervalo (segundos)
+ERROR_LOG_LIMIT = 10
+ERROR_LOG_INTERVAL = 60
+
+# Log de acceso: las solicitudes exitosas se muestrean, errores y lentas no
+ACCESS_LOG_ENABLED = True
+ACCESS_LOG_SAMPLE_RATE = 1.0
+ACCESS_LOG_SLOW_MS = 500
+ACCESS_LOG_ERROR_STATUS = 500
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": True,
@@ -34,9 +138,12 @@ LOGGING = {
         },
         "request": {
             "class": "app.logger.RequestFormatter",
-            "format": "[%(name)s] [%(asctime)s.%(msecs)d] [%(endpoint)s - %(method)s] (%(levelname)s): %(message)s",
+            "format": "[%(name)s] [%(asctime)s.%(msecs)d] [%(endpoint)s - %(method)s] [%(request_id)s] (%(levelname)s): %(message)s",
             "datefmt": "%Y-%m-%d %H:%M:%S",
         },
+        "json": {
+            "class": "app.logger.JSONFormatter",
+        },
     },
     "handlers": {
         "default": {
@@ -51,14 +158,22 @@ LOGGING = {
         },
         "root_file": {
             "level": "DEBUG" if DEBUG else "INFO",
-            "class": "logging.FileHandler",
+            "class": "logging.handlers.RotatingFileHandler",
             "filename": join(LOGS_ROOT, "app.log"),
+            "maxBytes": 10 * 1024 * 1024,
+            "backupCount": 5,
             "formatter": "request",
         },
+        # Escribe en "console" y "root_file" desde un hilo aparte
+        "async": {
+            "class": "app.logger.AsyncQueueHandler",
+            "handlers": ["console", "root_file"],
+            "maxsize": 10000,
+        },
     },
     "loggers": {
         "app": {
-            "handlers": ["console", "root_file"],
+            "handlers": ["async"],
             "level": "DEBUG" if DEBUG else "INFO",
             "propagate": False,
         }
@@ -1,3 +1,5 @@
+import os
+
 from .default import *
 
 APP_ENV = APP_ENV_PRODUCTION
@@ -7,3 +9,21 @@ SECRET_KEY = "supersecret"
 
 JWT_SECRET_KEY = "ultra-secret"
 JWT_COOKIE_SECURE = True
+
+ACCESS_LOG_SAMPLE_RATE = 0.05
+SQL_SERVER_TIMING = False
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR")
+
+# Límites compartidos entre workers si hay un Redis disponible
+RATELIMIT_STORAGE_URL = os.getenv("RATELIMIT_STORAGE_URL")
+RATELIMIT_STORAGE = "shared" if RATELIMIT_STORAGE_URL else "memory"
+LOGGING["handlers"]["root_file"]["formatter"] = "json"
+
+# Pool de conexiones por worker; el total es workers * (size + overflow)
+SQLALCHEMY_POOL_MODE = os.getenv("DB_POOL_MODE", "queue")
+SQLALCHEMY_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+SQLALCHEMY_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 5))
+SQLALCHEMY_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 10))
+SQLALCHEMY_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 900))
+SQLALCHEMY_POOL_PRE_PING = True
+SQLALCHEMY_POOL_USE_LIFO = True
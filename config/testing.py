@@ -2,3 +2,10 @@ from .default import *
 
 APP_ENV = APP_ENV_TESTING
 TESTING = True
+
+# Hashing en el hilo de la solicitud y con costo bajo
+PASSWORD_HASH_METHOD = "pbkdf2:sha256:1000"
+PASSWORD_HASH_WORKERS = 0
+
+# Fallar las pruebas que generen consultas N+1
+SQL_NPLUSONE_RAISE = True
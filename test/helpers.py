@@ -0,0 +1,42 @@
+from contextlib import contextmanager
+from typing import List
+
+from sqlalchemy import event
+
+from app.db import db
+
+
+class QueryCounter:
+    """Registra las sentencias SQL ejecutadas por el engine"""
+
+    def __init__(self):
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def __call__(self, _conn, _cursor, statement, *_args):
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries():
+    """Contar las consultas ejecutadas dentro del bloque"""
+    counter = QueryCounter()
+    event.listen(db.engine, "before_cursor_execute", counter)
+    try:
+        yield counter
+    finally:
+        event.remove(db.engine, "before_cursor_execute", counter)
+
+
+@contextmanager
+def assert_num_queries(expected: int):
+    """Falla si el bloque ejecuta una cantidad distinta de consultas"""
+    with count_queries() as counter:
+        yield counter
+    statements = "\n".join(counter.statements)
+    assert (
+        counter.count == expected
+    ), f"Expected {expected} queries, got {counter.count}:\n{statements}"
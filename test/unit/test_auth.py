@@ -1,10 +1,21 @@
+import json
+from unittest import mock
 from uuid import uuid4
 
 import pytest
-from sqlalchemy import select
+from marshmallow import ValidationError
+from sqlalchemy import inspect, select
+from sqlalchemy.orm import joinedload
 
+from app.auth.cache import identity_cache
+from app.auth.hashing import password_hasher
 from app.auth.models import Role, User
+from app.auth.schemas import LoginSchema, UserImportSchema, UserSchema
+from app.core.serializers import compile_schema
+from app.core.exceptions import BadRequestError
+from app.core.ratelimit import SharedBackend
 from app.db import db
+from test.helpers import assert_num_queries, count_queries
 
 
 def create_role(name: str, **values):
@@ -174,3 +185,511 @@ class TestAuth:
                 guest_resp = client.get("/protected")
 
                 assert guest_resp.status_code == 403
+
+
+class TestIdentityCache:
+    def login(self, client, email, password):
+        return client.post("/login", json={"email": email, "password": password})
+
+    def test_lookup_uses_cache(self, app, client):
+        with app.app_context():
+            create_user(email="foo@bar.com", password="abcd")
+            self.login(client, "foo@bar.com", "abcd")
+
+            assert client.get("/me").status_code == 200
+            assert client.get("/me").status_code == 200
+
+            stats = identity_cache.stats()
+            assert stats["misses"] == 1
+            assert stats["hits"] == 1
+
+    def test_cached_roles(self, app, client):
+        with app.app_context():
+            admin_role = create_role("ADMINISTRATOR")
+            create_user(email="foo@bar.com", password="abcd", roles=[admin_role])
+            self.login(client, "foo@bar.com", "abcd")
+
+            client.get("/me")
+            resp = client.get("/protected")
+
+            assert resp.status_code == 200
+            assert identity_cache.stats()["hits"] == 1
+
+    def test_invalidate_on_save(self, app, client):
+        with app.app_context():
+            user = create_user(email="foo@bar.com", password="abcd")
+            self.login(client, "foo@bar.com", "abcd")
+            client.get("/me")
+            assert identity_cache.stats()["size"] == 1
+
+            user.is_active = False
+            user.save(set_password=False)
+
+            assert identity_cache.stats()["size"] == 0
+            assert client.get("/me").json["isActive"] is False
+
+    def test_invalidate_on_role_change(self, app, client):
+        with app.app_context():
+            user = create_user(email="foo@bar.com", password="abcd")
+            self.login(client, "foo@bar.com", "abcd")
+            assert client.get("/protected").status_code == 403
+
+            admin_role = create_role("ADMINISTRATOR")
+            user.roles.append(admin_role)
+            user.save(set_password=False)
+
+            assert client.get("/protected").status_code == 200
+
+    def test_merge_snapshot_without_loading(self, app):
+        with app.app_context():
+            role = create_role("ADMINISTRATOR")
+            user = create_user(email="foo@bar.com", roles=[role])
+            identity_cache.set(user.id, user)
+            db.session.expunge_all()
+
+            cached = identity_cache.get(user.id)
+
+            assert cached is not None
+            assert not inspect(cached).unloaded
+            assert [role.name for role in cached.roles] == ["ADMINISTRATOR"]
+
+
+class TestRoleClaims:
+    def login(self, client, email, password):
+        return client.post("/login", json={"email": email, "password": password})
+
+    def test_claims_in_token(self, app, client):
+        app.config["AUTH_ROLE_CLAIMS"] = True
+        with app.app_context():
+            admin_role = create_role("ADMINISTRATOR")
+            create_user(email="foo@bar.com", password="abcd", roles=[admin_role])
+            self.login(client, "foo@bar.com", "abcd")
+
+            with mock.patch.object(User, "get_id", side_effect=AssertionError):
+                identity_cache.clear()
+                resp = client.get("/protected")
+
+            assert resp.status_code == 200
+
+    def test_claims_forbidden(self, app, client):
+        app.config["AUTH_ROLE_CLAIMS"] = True
+        with app.app_context():
+            create_role("ADMINISTRATOR")
+            create_user(email="guest@example.com", password="1234")
+            self.login(client, "guest@example.com", "1234")
+
+            assert client.get("/protected").status_code == 403
+
+    def test_stale_role_version(self, app, client):
+        app.config["AUTH_ROLE_CLAIMS"] = True
+        with app.app_context():
+            admin_role = create_role("ADMINISTRATOR")
+            user = create_user(email="foo@bar.com", password="abcd", roles=[admin_role])
+            self.login(client, "foo@bar.com", "abcd")
+            assert client.get("/protected").status_code == 200
+
+            user.roles.remove(admin_role)
+            user.save(set_password=False)
+
+            assert user.role_version == 1
+            assert client.get("/protected").status_code == 401
+
+    def test_lazy_current_user(self, app, client):
+        app.config["AUTH_ROLE_CLAIMS"] = True
+        with app.app_context():
+            create_user(email="foo@bar.com", password="abcd")
+            self.login(client, "foo@bar.com", "abcd")
+
+            resp = client.get("/me")
+
+            assert resp.status_code == 200
+            assert resp.json["email"] == "foo@bar.com"
+
+
+class TestPasswordHasher:
+    def test_rehash_on_login(self, app, client):
+        with app.app_context():
+            user = create_user(email="foo@bar.com", password="abcd")
+            assert user.password.startswith("pbkdf2:sha256:1000$")
+
+            app.config["PASSWORD_HASH_METHOD"] = "pbkdf2:sha256:2000"
+            password_hasher.init_app(app)
+            assert user.needs_rehash()
+
+            resp = client.post(
+                "/login", json={"email": "foo@bar.com", "password": "abcd"}
+            )
+
+            assert resp.status_code == 200
+            assert user.password.startswith("pbkdf2:sha256:2000$")
+            assert user.check_password("abcd")
+
+    def test_process_pool(self, app):
+        app.config["PASSWORD_HASH_WORKERS"] = 1
+        password_hasher.init_app(app)
+        with app.app_context():
+            try:
+                pwhash = password_hasher.hash("abcd")
+                assert password_hasher.verify(pwhash, "abcd") is True
+                assert password_hasher.verify(pwhash, "1234") is False
+            finally:
+                password_hasher.shutdown()
+
+    def test_backpressure(self, app, client):
+        with app.app_context():
+            create_user(email="foo@bar.com", password="abcd")
+
+            app.config["PASSWORD_HASH_WORKERS"] = 1
+            app.config["PASSWORD_HASH_QUEUE_SIZE"] = 0
+            password_hasher.init_app(app)
+            password_hasher.state.slots.acquire()
+
+            resp = client.post(
+                "/login", json={"email": "foo@bar.com", "password": "abcd"}
+            )
+
+            assert resp.status_code == 503
+            assert resp.headers["Retry-After"] == "1"
+            assert password_hasher.stats()["rejected"] == 1
+
+
+class TestEagerLoading:
+    def test_get_all_roles(self, app):
+        with app.app_context():
+            admin_role = create_role("ADMINISTRATOR")
+            guest_role = create_role("GUEST")
+            for i in range(5):
+                create_user(email=f"user{i}@mail.com", roles=[admin_role, guest_role])
+            db.session.expunge_all()
+
+            with assert_num_queries(2):
+                users = list(User.get_all())
+                dump = UserSchema(many=True).dump(users)
+
+            assert all(user["roles"] == ["ADMINISTRATOR", "GUEST"] for user in dump)
+
+    def test_get_id_joined(self, app):
+        with app.app_context():
+            role = create_role("ADMINISTRATOR")
+            user_id = create_user(roles=[role]).id
+            db.session.expunge_all()
+
+            with assert_num_queries(1):
+                query = User.get_id(user_id, load=[joinedload(User.roles)])
+                assert [role.name for role in query.roles] == ["ADMINISTRATOR"]
+
+    def test_me_round_trips(self, app, client):
+        with app.app_context():
+            role = create_role("ADMINISTRATOR")
+            create_user(email="foo@bar.com", password="abcd", roles=[role])
+            client.post("/login", json={"email": "foo@bar.com", "password": "abcd"})
+            identity_cache.clear()
+            db.session.expunge_all()
+
+            with assert_num_queries(2):
+                resp = client.get("/me")
+
+            assert resp.json["roles"] == ["ADMINISTRATOR"]
+
+
+class TestUserListing:
+    def login_admin(self, client):
+        admin_role = create_role("ADMINISTRATOR")
+        create_user(email="admin@mail.com", password="abcd", roles=[admin_role])
+        client.post("/login", json={"email": "admin@mail.com", "password": "abcd"})
+
+    def test_paginate_keyset(self, app):
+        with app.app_context():
+            ids = sorted(create_user(email=f"user{i}@mail.com").id for i in range(5))
+
+            first = User.paginate_keyset(limit=2)
+            second = User.paginate_keyset(limit=2, cursor=first.next_cursor)
+            last = User.paginate_keyset(limit=2, cursor=second.next_cursor)
+
+            assert [user.id for user in first.items] == ids[:2]
+            assert [user.id for user in second.items] == ids[2:4]
+            assert [user.id for user in last.items] == ids[4:]
+            assert last.next_cursor is None
+
+    def test_paginate_order_by(self, app):
+        with app.app_context():
+            for i in range(3):
+                create_user(email=f"user{i}@mail.com")
+
+            order_by = [User.email, User.id]
+            first = User.paginate_keyset(limit=2, order_by=order_by)
+            second = User.paginate_keyset(
+                limit=2, order_by=order_by, cursor=first.next_cursor
+            )
+
+            assert [user.email for user in first.items + second.items] == [
+                "user0@mail.com",
+                "user1@mail.com",
+                "user2@mail.com",
+            ]
+
+    def test_invalid_cursor(self, app):
+        with app.app_context():
+            with pytest.raises(BadRequestError):
+                User.paginate_keyset(cursor="not-a-cursor")
+
+    def test_stream(self, app):
+        with app.app_context():
+            for i in range(5):
+                create_user(email=f"user{i}@mail.com")
+
+            assert len(list(User.stream(batch_size=2))) == 5
+
+    def test_list_users(self, app, client):
+        with app.app_context():
+            self.login_admin(client)
+            for i in range(3):
+                create_user(email=f"user{i}@mail.com")
+
+            resp = client.get("/users?limit=3")
+            assert resp.status_code == 200
+            assert len(resp.json["items"]) == 3
+
+            resp = client.get(f"/users?limit=3&cursor={resp.json['next']}")
+            assert len(resp.json["items"]) == 1
+            assert resp.json["next"] is None
+
+            assert client.get("/users?limit=1000").status_code == 400
+
+    def test_export_users(self, app, client):
+        with app.app_context():
+            self.login_admin(client)
+            for i in range(3):
+                create_user(email=f"user{i}@mail.com")
+
+            resp = client.get("/users/export")
+
+            assert resp.status_code == 200
+            assert resp.is_streamed
+            assert len(resp.json) == 4
+            assert all("password" not in user for user in resp.json)
+
+
+class TestBulkImport:
+    def login_admin(self, app, client):
+        admin_role = create_role("ADMINISTRATOR")
+        create_user(email="admin@mail.com", password="abcd", roles=[admin_role])
+        client.post("/login", json={"email": "admin@mail.com", "password": "abcd"})
+        csrf = client.get_cookie(app.config["JWT_ACCESS_CSRF_COOKIE_NAME"])
+        return {app.config["JWT_ACCESS_CSRF_HEADER_NAME"]: csrf.value}
+
+    def test_import_ndjson(self, app, client):
+        with app.app_context():
+            headers = self.login_admin(app, client)
+            create_role("GUEST")
+            rows = [
+                {"email": "user1@mail.com", "password": "1234", "roles": ["GUEST"]},
+                {"email": "not-an-email", "password": "1234"},
+                {"email": "user2@mail.com", "password": "1234", "isActive": False},
+                {"email": "user3@mail.com", "password": "1234", "roles": ["NOPE"]},
+                {"email": "admin@mail.com", "password": "1234"},
+                {"email": "user2@mail.com", "password": "1234"},
+            ]
+            body = "\n".join(json.dumps(row) for row in rows) + "\n{broken\n"
+
+            resp = client.post(
+                "/users/import?chunkSize=2",
+                data=body,
+                content_type="application/x-ndjson",
+                headers=headers,
+            )
+
+            assert resp.status_code == 200
+            assert resp.json["created"] == 2
+            assert sorted(error["row"] for error in resp.json["errors"]) == [
+                2,
+                4,
+                5,
+                6,
+                7,
+            ]
+
+            user = User.get_email("user1@mail.com")
+            assert [role.name for role in user.roles] == ["GUEST"]
+            assert user.check_password("1234")
+            assert User.get_email("user2@mail.com").is_active is False
+
+    def test_import_csv(self, app, client):
+        with app.app_context():
+            headers = self.login_admin(app, client)
+            create_role("GUEST")
+            body = (
+                "email,password,roles\n"
+                "user1@mail.com,1234,GUEST|ADMINISTRATOR\n"
+                "user2@mail.com,1234,\n"
+            )
+
+            resp = client.post(
+                "/users/import", data=body, content_type="text/csv", headers=headers
+            )
+
+            assert resp.json == {"created": 2, "failed": 0, "errors": []}
+            user = User.get_email("user1@mail.com")
+            assert {role.name for role in user.roles} == {"GUEST", "ADMINISTRATOR"}
+
+    def test_import_unsupported(self, app, client):
+        with app.app_context():
+            headers = self.login_admin(app, client)
+
+            resp = client.post(
+                "/users/import", data="{}", content_type="text/plain", headers=headers
+            )
+
+            assert resp.status_code == 400
+
+    def test_import_command(self, app, runner, tmp_path):
+        path = tmp_path / "users.ndjson"
+        path.write_text('{"email": "user1@mail.com", "password": "1234"}\n{}\n')
+        with app.app_context():
+            result = runner.invoke(args=["auth", "import-users", str(path)])
+
+            assert "Created 1 users, 1 rows failed" in result.output
+            assert User.get_email("user1@mail.com") is not None
+
+
+class FakeRedis:
+    """Implementa los comandos de Redis que usa ``SharedBackend``"""
+
+    def __init__(self):
+        self.data = {}
+
+    def incr(self, key, amount=1):
+        self.data[key] = self.data.get(key, 0) + amount
+        return self.data[key]
+
+    def expire(self, key, seconds):
+        pass
+
+    def get(self, key):
+        return self.data.get(key)
+
+
+class TestLoginRateLimit:
+    def login(self, client, email="foo@bar.com", password="wrong"):
+        return client.post("/login", json={"email": email, "password": password})
+
+    def test_limit_by_email(self, app, client):
+        app.config["RATELIMIT_LOGIN_EMAIL"] = "2/minute"
+        with app.app_context():
+            create_user("foo@bar.com", "abcd")
+            statuses = [self.login(client).status_code for _ in range(2)]
+
+            with count_queries() as counter, mock.patch.object(
+                password_hasher, "verify"
+            ) as verify:
+                resp = self.login(client, "FOO@bar.com ", "abcd")
+            other = self.login(client, "bar@foo.com")
+
+        assert statuses == [401, 401]
+        assert resp.status_code == 429
+        assert int(resp.headers["Retry-After"]) >= 1
+        assert resp.headers["X-RateLimit-Remaining"] == "0"
+        assert resp.headers["X-RateLimit-Limit"] == "2"
+        assert counter.count == 0
+        verify.assert_not_called()
+        assert other.status_code == 401
+
+    def test_limit_by_ip(self, app, client):
+        app.config["RATELIMIT_LOGIN_IP"] = "3/minute"
+        with app.app_context():
+            statuses = [
+                self.login(client, f"user{i}@bar.com").status_code for i in range(4)
+            ]
+            remote = client.post(
+                "/login",
+                json={"email": "foo@bar.com", "password": "wrong"},
+                environ_base={"REMOTE_ADDR": "10.0.0.2"},
+            )
+
+        assert statuses == [401, 401, 401, 429]
+        assert remote.status_code == 401
+
+    def test_shared_backend(self, app, client):
+        app.config["RATELIMIT_LOGIN_EMAIL"] = "2/minute"
+        redis = FakeRedis()
+        with app.app_context():
+            app.extensions["rate_limiter"].backend = SharedBackend(redis)
+            statuses = [self.login(client).status_code for _ in range(3)]
+
+        assert statuses == [401, 401, 429]
+        assert any(
+            key.startswith("ratelimit:login-email:foo@bar.com") for key in redis.data
+        )
+
+    def test_disabled(self, app, client):
+        app.config["RATELIMIT_ENABLED"] = False
+        app.config["RATELIMIT_LOGIN_EMAIL"] = "1/minute"
+        with app.app_context():
+            statuses = [self.login(client).status_code for _ in range(3)]
+
+        assert statuses == [401, 401, 401]
+
+
+class TestCompiledSchemas:
+    SCHEMAS = [
+        UserSchema(),
+        UserSchema(only=("email", "password")),
+        UserSchema(only=("id", "roles")),
+        LoginSchema(),
+        UserImportSchema(many=True),
+    ]
+
+    @pytest.mark.parametrize("schema", SCHEMAS)
+    def test_dump(self, app, schema):
+        with app.app_context():
+            role = create_role("ADMIN")
+            user = create_user("foo@bar.com", is_active=False, roles=[role])
+            create_user("bar@foo.com")
+            users = list(User.get_all())
+
+            for obj, many in [(user, False), (users, True), ({}, False)]:
+                assert compile_schema(schema).dump(obj, many=many) == schema.dump(
+                    obj, many=many
+                )
+
+    @pytest.mark.parametrize("schema", SCHEMAS[:4])
+    @pytest.mark.parametrize(
+        "data",
+        [
+            {"email": "foo@bar.com", "password": "abcd"},
+            {"email": "foo@bar.com", "password": "abcd", "isActive": "false"},
+            {"email": "not-an-email", "roles": ["ADMIN"]},
+            {"email": None, "id": "bad", "extra": 1},
+            {"createdAt": "2024-01-01"},
+            {},
+            ["not", "a", "dict"],
+        ],
+    )
+    def test_load(self, schema, data):
+        def load(load_schema):
+            try:
+                return load_schema.load(data), None
+            except ValidationError as e:
+                return e.valid_data, e.messages
+
+        assert load(compile_schema(schema)) == load(schema)
+
+    def test_load_many(self):
+        schema = UserImportSchema(many=True)
+        data = [
+            {"email": "foo@bar.com", "password": "abcd", "roles": ["A"]},
+            {"email": "bad", "password": "abcd"},
+            "invalid",
+            {"email": "bar@foo.com", "password": "x", "isActive": "no"},
+        ]
+        with pytest.raises(ValidationError) as compiled:
+            compile_schema(schema).load(data)
+        with pytest.raises(ValidationError) as expected:
+            schema.load(data)
+
+        assert compiled.value.messages == expected.value.messages
+        assert compiled.value.valid_data == expected.value.valid_data
+
+    def test_cached(self):
+        schema = UserSchema()
+        assert compile_schema(schema) is compile_schema(schema)
@@ -0,0 +1,49 @@
+from benchmarks import bench_api
+from benchmarks.common import percentile, summarize
+from benchmarks.compare import compare
+from benchmarks.fixtures import BENCH_PASSWORD, seed, user_email
+from app.auth.models import User
+
+
+def test_percentiles():
+    latencies = [i / 1000 for i in range(1, 101)]
+
+    assert percentile(sorted(latencies), 50) == 0.05
+    assert percentile(sorted(latencies), 99) == 0.099
+    assert percentile([], 95) == 0.0
+
+    result = summarize("me", latencies, elapsed=2.0, errors=1)
+    assert result["requests_per_sec"] == 50.0
+    assert (result["p50_ms"], result["p95_ms"], result["p99_ms"]) == (50, 95, 99)
+
+
+def test_seed(app):
+    result = seed(app, users=50, admins=2, roles=5, max_roles=3, reset=False)
+
+    assert result["roles"] == 7
+    assert User.query.count() == 52
+    user = User.get_email(user_email(49), load=())
+    assert user.check_password(BENCH_PASSWORD)
+    assert "USER" in {role.name for role in user.roles}
+    assert len(user.roles) <= 3
+
+
+def test_api_scenarios(app):
+    seed(app, users=5, admins=1, reset=False)
+    app.config["RATELIMIT_ENABLED"] = False
+
+    results = bench_api.run(app, ["login", "protected"], seconds=0.05, warmup=1)
+
+    assert [result["scenario"] for result in results] == ["login", "protected"]
+    assert all(result["requests"] and not result["errors"] for result in results)
+
+
+def test_compare_flags_regressions():
+    base = {"me": {"requests_per_sec": 100, "p50_ms": 1, "p95_ms": 2, "p99_ms": 4}}
+    head = {"me": {"requests_per_sec": 80, "p50_ms": 1, "p95_ms": 2, "p99_ms": 4.2}}
+
+    rows = {row["metric"]: row for row in compare(base, head, threshold=10)}
+
+    assert rows["requests_per_sec"]["regression"]
+    assert rows["requests_per_sec"]["change_pct"] == -20.0
+    assert not rows["p99_ms"]["regression"]
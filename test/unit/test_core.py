@@ -0,0 +1,461 @@
+import gzip
+import json
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from unittest import mock
+from uuid import uuid4
+
+import pytest
+from marshmallow import Schema, fields, post_dump
+
+from app import create_app
+from app.auth.models import User
+from app.core.cache import LRUCache
+from app.core.errors import ErrorLog, api_error_response
+from app.core.exceptions import BadRequestError, NotAuthorizedError
+from app.core.json import FastJSONProvider
+from app.core.serializers import compile_schema
+from app.core.instrumentation import NPlusOneError, fingerprint
+from app.core.ratelimit import MemoryBackend, SharedBackend, parse_limit
+from app.core.metrics import Counter, Gauge, Histogram, merge, render
+from app.core.responses import stream_json_array
+
+
+class TestLRUCache:
+    def test_get_set(self):
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_evict_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.stats()["evictions"] == 1
+
+    def test_expire(self):
+        cache = LRUCache(maxsize=2, ttl=10)
+        with mock.patch("app.core.cache.monotonic", return_value=0):
+            cache.set("a", 1)
+        with mock.patch("app.core.cache.monotonic", return_value=11):
+            assert cache.get("a") is None
+        assert len(cache) == 0
+
+
+class TestStreamJsonArray:
+    @pytest.mark.parametrize("size", [0, 1, 3, 7])
+    def test_valid_json(self, app, size):
+        with app.test_request_context():
+            resp = stream_json_array(range(size), lambda i: {"i": i}, chunk_size=3)
+            body = b"".join(resp.iter_encoded())
+
+        assert json.loads(body) == [{"i": i} for i in range(size)]
+
+
+@pytest.fixture()
+def sql_records():
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    logger = logging.getLogger("app.sql")
+    logger.addHandler(handler)
+    yield records
+    logger.removeHandler(handler)
+
+
+@pytest.fixture()
+def repeated_view(app):
+    @app.get("/_test/repeated")
+    def repeated():
+        for _ in range(3):
+            User.get_id(uuid4())
+        return {}
+
+    return "/_test/repeated"
+
+
+class TestQueryInstrumentation:
+    def test_fingerprint(self):
+        assert fingerprint(
+            "SELECT a.id FROM auth_user a\n WHERE a.id = %(id_1)s::UUID "
+            "AND a.email IN (%(e_1)s, %(e_2)s) AND x = 'it''s' LIMIT 10"
+        ) == (
+            "SELECT a.id FROM auth_user a WHERE a.id = ?::UUID "
+            "AND a.email IN (...) AND x = ? LIMIT ?"
+        )
+        assert fingerprint("INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s)") == (
+            "INSERT INTO t (a, b) VALUES (...)"
+        )
+
+    def test_server_timing(self, app, client, repeated_view):
+        with app.app_context():
+            resp = client.get(repeated_view)
+
+        assert 'desc="3 queries"' in resp.headers["Server-Timing"]
+
+        app.config["SQL_SERVER_TIMING"] = False
+        with app.app_context():
+            resp = client.get(repeated_view)
+        assert "Server-Timing" not in resp.headers
+
+    def test_slow_query(self, app, client, repeated_view, sql_records):
+        app.config["SQL_SLOW_QUERY_MS"] = 0
+        with app.app_context():
+            client.get(repeated_view)
+
+        assert len(sql_records) == 3
+        assert all(r.sql.startswith("SELECT auth_user.id") for r in sql_records)
+        assert all(r.duration_ms >= 0 for r in sql_records)
+
+    def test_nplusone(self, app, client, repeated_view, sql_records):
+        app.config["SQL_NPLUSONE_THRESHOLD"] = 2
+        with app.app_context(), pytest.raises(NPlusOneError):
+            client.get(repeated_view)
+
+        app.config["SQL_NPLUSONE_RAISE"] = False
+        with app.app_context():
+            assert client.get(repeated_view).status_code == 200
+        assert [r.repeated for r in sql_records] == [3, 3]
+
+
+class TestMetrics:
+    def test_render(self):
+        counter = Counter("jobs_total", "Jobs", ["queue"])
+        counter.inc(queue="a")
+        counter.inc(2, queue='say "hi"')
+        histogram = Histogram("job_seconds", "Job time", buckets=(0.1, 1))
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        families = merge([(True, {m.name: m.family() for m in (counter, histogram)})])
+
+        assert render(families).splitlines() == [
+            "# HELP job_seconds Job time",
+            "# TYPE job_seconds histogram",
+            'job_seconds_bucket{le="0.1"} 1.0',
+            'job_seconds_bucket{le="1.0"} 2.0',
+            'job_seconds_bucket{le="+Inf"} 2.0',
+            "job_seconds_sum 0.55",
+            "job_seconds_count 2.0",
+            "# HELP jobs_total Jobs",
+            "# TYPE jobs_total counter",
+            'jobs_total{queue="a"} 1.0',
+            'jobs_total{queue="say \\"hi\\""} 2.0',
+        ]
+
+    def test_merge_processes(self):
+        counter = Counter("jobs_total", "Jobs")
+        counter.inc()
+        gauge = Gauge("jobs_running", "Running jobs")
+        gauge.inc()
+        snapshot = {m.name: m.family() for m in (counter, gauge)}
+
+        families = merge([(True, snapshot), (True, snapshot), (False, snapshot)])
+
+        assert families["jobs_total"]["samples"] == [[[], 3]]
+        assert families["jobs_running"]["samples"] == [[[], 2]]
+
+    def test_request_metrics(self, app, client):
+        with app.app_context():
+            client.get("/me")
+            client.post("/login", json={"email": "foo@bar.com", "password": "abcd"})
+            body = client.get("/metrics").get_data(as_text=True)
+
+        assert (
+            'http_requests_total{endpoint="auth.who_am_i",method="GET",status="401"} 1.0'
+            in body
+        )
+        assert 'http_errors_total{error="NotAuthorizedError"} 1.0' in body
+        assert "http_requests_in_progress 1.0" in body
+        assert 'db_pool_checkouts_total{bind="default"}' in body
+        assert (
+            'http_request_duration_seconds_count{endpoint="auth.who_am_i",status="401"} 1.0'
+            in body
+        )
+
+    def test_restricted(self, app, client):
+        with app.app_context():
+            resp = client.get("/metrics", environ_base={"REMOTE_ADDR": "10.1.2.3"})
+
+        assert resp.status_code == 404
+
+    def test_multiprocess(self, app, client, monkeypatch, tmp_path):
+        monkeypatch.setattr("config.testing.METRICS_MULTIPROC_DIR", str(tmp_path))
+        app_ = create_app("config.testing")
+        other = Counter(
+            "http_requests_total", "Requests", ["endpoint", "method", "status"]
+        )
+        other.inc(5, endpoint="auth.who_am_i", method="GET", status=401)
+        (tmp_path / "metrics-1.json").write_text(
+            json.dumps({"pid": os.getppid(), "metrics": {other.name: other.family()}})
+        )
+
+        with app_.app_context():
+            client = app_.test_client()
+            client.get("/me")
+            body = client.get("/metrics").get_data(as_text=True)
+
+        assert (tmp_path / f"metrics-{os.getpid()}.json").exists()
+        assert (
+            'http_requests_total{endpoint="auth.who_am_i",method="GET",status="401"} 6.0'
+            in body
+        )
+
+
+class TestErrorResponses:
+    def test_to_dict_copies_payload(self):
+        payload = {"field": "email"}
+        error = BadRequestError(payload=payload)
+
+        assert error.to_dict() == {"field": "email", "message": error.message}
+        assert payload == {"field": "email"}
+
+    def test_static_body_cached(self, app):
+        with app.test_request_context():
+            first = api_error_response(NotAuthorizedError())
+            second = api_error_response(NotAuthorizedError())
+            custom = api_error_response(NotAuthorizedError("Expired", payload={"a": 1}))
+
+        assert first.status_code == second.status_code == 401
+        assert first.get_json() == {"message": "Not authorized"}
+        assert list(app.extensions["error_bodies"]) == ["Not authorized"]
+        assert custom.get_json() == {"a": 1, "message": "Expired"}
+
+    def test_not_found(self, client):
+        resp = client.get("/does-not-exist")
+
+        assert resp.status_code == 404
+        assert resp.get_json() == {"message": "Resource not found"}
+
+
+class TestErrorLog:
+    def test_rate_limit(self):
+        records = []
+        logger = logging.getLogger("test.errors")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.handlers = [logging.Handler()]
+        logger.handlers[0].emit = records.append
+        error_log = ErrorLog(logger, limit=2, interval=10)
+
+        with mock.patch("app.core.errors.monotonic", return_value=0):
+            for _ in range(5):
+                error_log.log(ValueError("boom"), "Unexpected server error")
+        with mock.patch("app.core.errors.monotonic", return_value=11):
+            error_log.log(ValueError("boom"), "Unexpected server error")
+
+        assert [r.suppressed for r in records] == [0, 0, 3]
+        assert "3 similar errors suppressed" in records[-1].getMessage()
+        assert all(r.exc_info is None for r in records)
+        assert error_log.stats() == {"ValueError": {"count": 6, "suppressed": 3}}
+
+    def test_traceback_when_debug(self):
+        records = []
+        logger = logging.getLogger("test.errors.debug")
+        logger.setLevel(logging.DEBUG)
+        logger.propagate = False
+        logger.handlers = [logging.Handler()]
+        logger.handlers[0].emit = records.append
+
+        ErrorLog(logger).log(ValueError("boom"), "Unexpected server error")
+
+        [record] = records
+        assert record.exc_info[0] is ValueError
+
+
+class TestRateLimitBackends:
+    def test_parse_limit(self):
+        assert parse_limit("5/minute") == (5, 60)
+        assert parse_limit("100 / 10 seconds") == (100, 10)
+        with pytest.raises(ValueError):
+            parse_limit("5 per minute")
+
+    def test_token_bucket_refill(self):
+        backend = MemoryBackend()
+        with mock.patch("app.core.ratelimit.monotonic", return_value=0):
+            results = [backend.hit("k", 2, 60) for _ in range(3)]
+        with mock.patch("app.core.ratelimit.monotonic", return_value=30):
+            refilled = backend.hit("k", 2, 60)
+
+        assert [r.allowed for r in results] == [True, True, False]
+        assert results[-1].retry_after == 30
+        assert refilled.allowed
+        assert refilled.remaining == 0
+
+    def test_sliding_window(self):
+        class Store(dict):
+            def incr(self, key, amount=1):
+                self[key] = self.get(key, 0) + amount
+                return self[key]
+
+            def expire(self, key, seconds):
+                pass
+
+        backend = SharedBackend(Store())
+        with mock.patch("app.core.ratelimit.time", return_value=60):
+            first = [backend.hit("k", 2, 60).allowed for _ in range(3)]
+        # A mitad de la siguiente ventana la anterior aún pesa la mitad
+        with mock.patch("app.core.ratelimit.time", return_value=150):
+            second = [backend.hit("k", 2, 60).allowed for _ in range(2)]
+
+        assert first == [True, True, False]
+        assert second == [False, False]
+
+
+@pytest.fixture()
+def json_view(app):
+    @app.get("/_test/items/<int:size>")
+    def items(size):
+        return {"items": ["x" * 10] * size}
+
+    return "/_test/items/{}"
+
+
+class TestCompression:
+    def test_compress_large_json(self, client, json_view):
+        resp = client.get(json_view.format(500), headers={"Accept-Encoding": "gzip"})
+
+        assert resp.headers["Content-Encoding"] == "gzip"
+        assert resp.headers["Vary"] == "Accept-Encoding"
+        assert json.loads(gzip.decompress(resp.data))["items"] == ["x" * 10] * 500
+
+    def test_skip_small_json(self, client, json_view):
+        resp = client.get(json_view.format(1), headers={"Accept-Encoding": "gzip"})
+
+        assert "Content-Encoding" not in resp.headers
+        assert resp.headers["Vary"] == "Accept-Encoding"
+
+    @pytest.mark.parametrize("accept", [None, "identity", "gzip;q=0", "deflate"])
+    def test_not_accepted(self, client, json_view, accept):
+        headers = {"Accept-Encoding": accept} if accept else {}
+        resp = client.get(json_view.format(500), headers=headers)
+
+        assert "Content-Encoding" not in resp.headers
+        assert resp.get_json()["items"][0] == "x" * 10
+
+    def test_level(self, app, client, json_view):
+        app.config["COMPRESS_GZIP_LEVEL"] = 1
+        fast = client.get(json_view.format(500), headers={"Accept-Encoding": "gzip"})
+        app.config["COMPRESS_GZIP_LEVEL"] = 9
+        best = client.get(json_view.format(500), headers={"Accept-Encoding": "gzip"})
+
+        assert gzip.decompress(fast.data) == gzip.decompress(best.data)
+
+
+class TestJSONProvider:
+    @dataclass
+    class Point:
+        x: int
+        y: int
+
+    def sample(self):
+        return {
+            "id": uuid4(),
+            "when": datetime(2024, 1, 2, 3, 4, 5),
+            "point": self.Point(1, 2),
+            "b": [1, 2.5, None, True],
+            "a": "text",
+        }
+
+    def test_same_output_as_stdlib(self, app):
+        from flask.json.provider import DefaultJSONProvider
+
+        data = self.sample()
+        fast, stdlib = FastJSONProvider(app), DefaultJSONProvider(app)
+
+        assert fast.use_orjson
+        for kwargs in ({}, {"separators": (",", ":")}):
+            assert json.loads(fast.dumps(data, **kwargs)) == json.loads(
+                stdlib.dumps(data, **kwargs)
+            )
+        assert fast.dumps({"b": 1, "a": 2}) == '{"a":2,"b":1}'
+        assert json.loads(fast.dumps(data))["when"] == "Tue, 02 Jan 2024 03:04:05 GMT"
+
+    def test_iso_dates(self, app):
+        app.config["JSON_DATETIME_FORMAT"] = "iso"
+        provider = FastJSONProvider(app)
+        provider.use_orjson = False
+
+        assert json.loads(provider.dumps(self.sample()))["when"] == (
+            "2024-01-02T03:04:05"
+        )
+        provider.use_orjson = True
+        assert json.loads(provider.dumps(self.sample()))["when"] == (
+            "2024-01-02T03:04:05"
+        )
+
+    def test_fallback(self, app):
+        provider = FastJSONProvider(app)
+
+        assert provider.dumps({"n": 2**70}) == '{"n": 1180591620717411303424}'
+        assert provider.loads(b'{"a": [1, 2]}') == {"a": [1, 2]}
+        with pytest.raises(ValueError):
+            provider.loads("{invalid")
+
+    def test_response(self, app, client):
+        with app.app_context():
+            resp = client.post(
+                "/signup", json={"email": "foo@bar.com", "password": "x"}
+            )
+
+        assert isinstance(app.json, FastJSONProvider)
+        assert resp.status_code == 201
+        assert resp.get_json()["email"] == "foo@bar.com"
+
+
+class TestCompiledSchema:
+    class ItemSchema(Schema):
+        name = fields.String(data_key="itemName")
+        price = fields.Float(dump_default=0)
+        tags = fields.List(fields.String())
+
+    class OrderSchema(Schema):
+        id = fields.Integer()
+        total = fields.Method("get_total")
+        items = fields.Nested(lambda: TestCompiledSchema.ItemSchema(many=True))
+        created = fields.DateTime(format="iso", attribute="created_at")
+
+        def get_total(self, obj):
+            return sum(item.get("price", 0) for item in obj["items"])
+
+    def order(self):
+        return {
+            "id": "7",
+            "created_at": datetime(2024, 1, 2),
+            "items": [{"name": "a", "price": 2, "tags": ["x"]}, {"name": "b"}],
+        }
+
+    def test_nested_and_fallback_fields(self):
+        schema = self.OrderSchema()
+        compiled = compile_schema(schema)
+
+        assert not compiled.dump_fallback
+        assert compiled.dump(self.order()) == schema.dump(self.order())
+
+    def test_hooks_use_marshmallow(self):
+        class Upper(self.ItemSchema):
+            @post_dump
+            def upper(self, data, **kwargs):
+                return {key: str(value).upper() for key, value in data.items()}
+
+        schema = Upper()
+        compiled = compile_schema(schema)
+
+        assert compiled.dump_fallback and compiled.load_fallback
+        assert compiled.dump({"name": "a"}) == {"itemName": "A", "price": "0.0"}
+
+    def test_partial_load(self):
+        class Required(Schema):
+            name = fields.String(required=True)
+
+        assert compile_schema(Required()).load({}, partial=True) == {}
@@ -0,0 +1,208 @@
+import pytest
+from sqlalchemy import insert, select
+
+from app import create_app
+from app.auth.models import Role, User
+from app.core.exceptions import ConflictError
+from app.core.pool import (
+    InstrumentedNullPool,
+    InstrumentedQueuePool,
+    engine_options,
+    pool_stats,
+)
+from app.db import (
+    db,
+    in_transaction,
+    register_request_transaction,
+    transaction,
+    use_primary,
+)
+from test.helpers import count_queries
+from test.unit.test_auth import create_role, create_user
+
+
+class TestUnitOfWork:
+    def test_commit_once(self, app):
+        with app.app_context():
+            with count_queries() as counter:
+                with transaction():
+                    create_role("ADMINISTRATOR")
+                    create_role("GUEST")
+                    assert in_transaction()
+                    assert counter.count == 0
+
+            assert not in_transaction()
+            assert len(list(Role.get_all())) == 2
+
+    def test_rollback(self, app):
+        with app.app_context():
+            with pytest.raises(RuntimeError):
+                with transaction():
+                    create_role("ADMINISTRATOR")
+                    raise RuntimeError
+
+            assert list(Role.get_all()) == []
+
+    def test_map_integrity_error(self, app):
+        with app.app_context():
+            create_role("ADMINISTRATOR")
+            with pytest.raises(ConflictError):
+                with transaction():
+                    create_role("GUEST")
+                    create_role("ADMINISTRATOR")
+
+            assert [role.name for role in Role.get_all()] == ["ADMINISTRATOR"]
+
+    def test_nested_savepoint(self, app):
+        with app.app_context():
+            create_role("ADMINISTRATOR")
+            with transaction():
+                create_role("GUEST")
+                with pytest.raises(ConflictError):
+                    with transaction():
+                        create_role("ADMINISTRATOR")
+
+            assert {role.name for role in Role.get_all()} == {"ADMINISTRATOR", "GUEST"}
+
+    def test_save_outside_transaction(self, app):
+        with app.app_context():
+            create_user(email="foo@bar.com")
+            with pytest.raises(ConflictError):
+                create_user(email="foo@bar.com")
+
+            assert len(list(User.get_all())) == 1
+
+
+class TestRequestTransaction:
+    @pytest.fixture()
+    def app(self, app):
+        app.config["SQLALCHEMY_REQUEST_TRANSACTION"] = True
+        register_request_transaction(app)
+        return app
+
+    def test_commit_at_end(self, app, client):
+        with app.app_context():
+            resp = client.post(
+                "/signup", json={"email": "foo@bar.com", "password": "abcd"}
+            )
+
+            assert resp.status_code == 201
+            assert not in_transaction()
+            db.session.expunge_all()
+            assert User.get_email("foo@bar.com") is not None
+
+    def test_conflict_on_commit(self, app, client):
+        with app.app_context():
+            create_user(email="foo@bar.com")
+
+            resp = client.post(
+                "/signup", json={"email": "foo@bar.com", "password": "abcd"}
+            )
+
+            assert resp.status_code == 409
+            assert len(list(User.get_all())) == 1
+
+
+class TestConnectionPool:
+    def test_engine_options(self):
+        config = {
+            "SQLALCHEMY_DATABASE_URI": "postgresql://localhost/db",
+            "SQLALCHEMY_POOL_SIZE": 3,
+            "SQLALCHEMY_ENGINE_OPTIONS": {"pool_timeout": 1},
+        }
+        options = engine_options(config)
+
+        assert options["poolclass"] is InstrumentedQueuePool
+        assert options["pool_size"] == 3
+        assert options["pool_timeout"] == 1
+        assert options["pool_pre_ping"] is True
+
+    def test_null_pool_mode(self):
+        config = {
+            "SQLALCHEMY_DATABASE_URI": "postgresql://localhost/db",
+            "SQLALCHEMY_POOL_MODE": "null",
+        }
+        options = engine_options(config)
+
+        assert options["poolclass"] is InstrumentedNullPool
+        assert "pool_size" not in options
+
+    def test_sqlite_untouched(self):
+        assert engine_options({"SQLALCHEMY_DATABASE_URI": "sqlite://"}) == {}
+
+    def test_pool_metrics(self, app):
+        with app.app_context():
+            create_role("ADMINISTRATOR")
+            stats = pool_stats(db.engine)
+
+            assert stats["class"] == "InstrumentedQueuePool"
+            assert stats["checkouts"] >= 1
+            assert stats["wait_seconds"]["buckets"]["+Inf"] == stats["checkouts"]
+
+    def test_pool_endpoint(self, app, client):
+        with app.app_context():
+            resp = client.get("/_internal/pool")
+            assert resp.status_code == 200
+            assert "checked_out" in resp.json["default"]
+
+            resp = client.get(
+                "/_internal/pool", environ_base={"REMOTE_ADDR": "203.0.113.7"}
+            )
+            assert resp.status_code == 404
+
+
+class TestReplicaRouting:
+    @pytest.fixture()
+    def replica_app(self, app, monkeypatch):
+        uri = app.config["SQLALCHEMY_DATABASE_URI"]
+        monkeypatch.setattr(
+            "config.testing.SQLALCHEMY_BINDS",
+            {"replica_1": uri, "replica_2": uri},
+            raising=False,
+        )
+        monkeypatch.setattr(
+            "config.testing.SQLALCHEMY_REPLICA_BINDS", ["replica_1", "replica_2"]
+        )
+        app_ = create_app("config.testing")
+        yield app_
+        with app_.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
+        # Las réplicas no tienen tablas propias, ``drop_all`` no debe recorrerlas
+        for key in ("replica_1", "replica_2"):
+            db.metadatas.pop(key, None)
+
+    def test_reads_round_robin(self, replica_app):
+        with replica_app.app_context():
+            engines = db.engines
+            binds = [db.session.get_bind(clause=select(User)) for _ in range(4)]
+
+            assert binds == [engines["replica_1"], engines["replica_2"]] * 2
+
+    def test_writes_to_primary(self, replica_app):
+        with replica_app.app_context():
+            primary = db.engines[None]
+            assert db.session.get_bind(clause=insert(User)) is primary
+            assert db.session.get_bind(clause=select(User).with_for_update()) is primary
+
+    def test_read_after_write(self, replica_app):
+        with replica_app.app_context():
+            primary = db.engines[None]
+            create_role("ADMINISTRATOR")
+            assert db.session.get_bind(clause=select(Role)) is not primary
+
+            with transaction():
+                create_role("GUEST")
+                db.session.flush()
+                assert db.session.get_bind(clause=select(Role)) is primary
+
+            with use_primary():
+                assert db.session.get_bind(clause=select(Role)) is primary
+
+    def test_queries_through_replicas(self, replica_app):
+        with replica_app.app_context():
+            create_user(email="foo@bar.com")
+            db.session.expunge_all()
+
+            assert User.get_email("foo@bar.com") is not None
+            assert len(list(User.get_all())) == 1
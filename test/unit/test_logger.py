@@ -0,0 +1,168 @@
+import json
+import logging
+import sys
+from logging.config import dictConfig
+
+import pytest
+
+from app.logger import JSONFormatter, queue_handlers_stats
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture()
+def async_logger():
+    dictConfig(
+        {
+            "version": 1,
+            "disable_existing_loggers": False,
+            "formatters": {
+                "request": {
+                    "class": "app.logger.RequestFormatter",
+                    "format": "[%(endpoint)s - %(method)s] %(message)s",
+                }
+            },
+            "handlers": {
+                "async": {
+                    "class": "app.logger.AsyncQueueHandler",
+                    "handlers": ["memory"],
+                    "maxsize": 2,
+                },
+                "memory": {"class": "test.unit.test_logger.ListHandler"},
+            },
+            "loggers": {"test.async": {"handlers": ["async"], "level": "DEBUG"}},
+        }
+    )
+    logger = logging.getLogger("test.async")
+    handler = logger.handlers[0]
+    handler.start()
+    yield logger, handler
+    logger.removeHandler(handler)
+    handler.close()
+
+
+class TestAsyncQueueHandler:
+    def test_write_in_background(self, async_logger):
+        logger, handler = async_logger
+        logger.info("hello %s", "world")
+        handler.stop()
+
+        [target] = handler.handlers
+        assert [record.getMessage() for record in target.records] == ["hello world"]
+
+    def test_capture_request_context(self, app, async_logger):
+        logger, handler = async_logger
+        with app.test_request_context("/me", method="GET"):
+            logger.info("inside")
+        handler.stop()
+
+        [record] = handler.handlers[0].records
+        assert record.endpoint == "auth.who_am_i"
+        assert record.method == "GET"
+
+    def test_drop_when_full(self, async_logger):
+        logger, handler = async_logger
+        handler.stop()
+        record = logger.makeRecord(logger.name, logging.INFO, "", 0, "full", (), None)
+        for _ in range(5):
+            handler.enqueue(handler.prepare(record))
+
+        assert handler.dropped == 3
+        assert {"name": "async", "queued": 2, "maxsize": 2, "dropped": 3} in (
+            queue_handlers_stats()
+        )
+
+
+class TestRequestId:
+    def test_generate_request_id(self, client):
+        resp = client.get("/me")
+        assert len(resp.headers["X-Request-ID"]) == 32
+
+    def test_propagate_request_id(self, client):
+        resp = client.get("/me", headers={"X-Request-ID": "abc-123"})
+        assert resp.headers["X-Request-ID"] == "abc-123"
+
+    def test_reject_invalid_request_id(self, client):
+        resp = client.get("/me", headers={"X-Request-ID": "bad id!"})
+        assert resp.headers["X-Request-ID"] != "bad id!"
+
+
+@pytest.fixture()
+def access_records():
+    handler = ListHandler()
+    logger = logging.getLogger("app.access")
+    logger.addHandler(handler)
+    yield handler.records
+    logger.removeHandler(handler)
+
+
+class TestAccessLog:
+    def test_log_request(self, app, client, access_records):
+        with app.app_context():
+            client.get("/me")
+
+        [record] = access_records
+        assert record.route == "/me"
+        assert record.status == 401
+        assert record.latency_ms >= 0
+        assert record.db_queries == 0
+
+    def test_db_stats(self, app, client, access_records):
+        with app.app_context():
+            client.post("/signup", json={"email": "foo@bar.com", "password": "abcd"})
+
+        [record] = access_records
+        assert record.status == 201
+        assert record.db_queries >= 1
+        assert record.db_time_ms > 0
+
+    def test_sampling(self, app, client, access_records):
+        app.config["ACCESS_LOG_SAMPLE_RATE"] = 0
+        app.config["ACCESS_LOG_ERROR_STATUS"] = 400
+        with app.app_context():
+            client.post("/signup", json={"email": "foo@bar.com", "password": "abcd"})
+            client.get("/me")
+
+            app.config["ACCESS_LOG_SLOW_MS"] = 0
+            client.post("/signup", json={"email": "bar@foo.com", "password": "abcd"})
+
+        assert [(r.status, r.levelname) for r in access_records] == [
+            (401, "ERROR"),
+            (201, "WARNING"),
+        ]
+
+
+class TestJSONFormatter:
+    def test_format(self, app):
+        formatter = JSONFormatter()
+        record = logging.getLogger("app").makeRecord(
+            "app", logging.INFO, "", 0, "hello %s", ("world",), None
+        )
+        record.status = 200
+        with app.test_request_context("/me"):
+            app.preprocess_request()
+            data = json.loads(formatter.format(record))
+
+        assert data["message"] == "hello world"
+        assert data["level"] == "INFO"
+        assert data["status"] == 200
+        assert data["endpoint"] == "auth.who_am_i"
+        assert len(data["request_id"]) == 32
+
+    def test_format_exception(self):
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            record = logging.getLogger("app").makeRecord(
+                "app", logging.ERROR, "", 0, "failed", (), sys.exc_info()
+            )
+
+        data = json.loads(JSONFormatter().format(record))
+        assert "ValueError: boom" in data["exception"]
@@ -0,0 +1,127 @@
+import gzip
+import os
+
+import pytest
+
+
+@pytest.fixture()
+def media_root(app, tmp_path):
+    state = app.extensions["media"]
+    state.root = app.config["MEDIA_ROOT"] = str(tmp_path)
+    state.max_data_size = 8
+    (tmp_path / "logo.png").write_bytes(b"\x89PNG1234")
+    (tmp_path / "notes.txt").write_bytes(b"0123456789" * 10)
+    return tmp_path
+
+
+class TestMedia:
+    def test_send_file(self, client, media_root):
+        resp = client.get("/media/logo.png")
+
+        assert resp.status_code == 200
+        assert resp.data == b"\x89PNG1234"
+        assert resp.mimetype == "image/png"
+        assert resp.headers["Cache-Control"] == "public, max-age=604800"
+        assert resp.headers["ETag"]
+        assert resp.headers["Last-Modified"]
+
+    def test_not_modified(self, client, media_root):
+        etag = client.get("/media/notes.txt").headers["ETag"]
+        resp = client.get("/media/notes.txt", headers={"If-None-Match": etag})
+
+        assert resp.status_code == 304
+        assert resp.data == b""
+
+    @pytest.mark.parametrize("path", ["logo.png", "notes.txt"])
+    def test_range(self, client, media_root, path):
+        resp = client.get(f"/media/{path}", headers={"Range": "bytes=2-5"})
+
+        assert resp.status_code == 206
+        assert resp.data == (media_root / path).read_bytes()[2:6]
+        assert resp.headers["Content-Range"].startswith("bytes 2-5/")
+
+    def test_range_not_satisfiable(self, client, media_root):
+        resp = client.get("/media/notes.txt", headers={"Range": "bytes=500-"})
+
+        assert resp.status_code == 416
+        assert resp.headers["Content-Range"] == "bytes */100"
+
+    @pytest.mark.parametrize("path", ["missing.png", "../secret.txt", "."])
+    def test_not_found(self, client, media_root, path):
+        assert client.get(f"/media/{path}").status_code == 404
+
+    def test_cached_metadata(self, app, client, media_root):
+        app.extensions["media"].check_interval = 60
+        client.get("/media/logo.png")
+        (media_root / "logo.png").write_bytes(b"changed")
+        resp = client.get("/media/logo.png")
+
+        # El archivo no se vuelve a revisar hasta que vence el intervalo
+        assert resp.data == b"\x89PNG1234"
+        assert app.extensions["media"].cache.stats()["hits"] == 1
+
+    def test_invalidate_on_change(self, app, client, media_root):
+        app.extensions["media"].check_interval = 0
+        first = client.get("/media/logo.png")
+        path = media_root / "logo.png"
+        path.write_bytes(b"changed")
+        os.utime(path, ns=(0, path.stat().st_mtime_ns + 10**9))
+        second = client.get("/media/logo.png")
+
+        assert second.data == b"changed"
+        assert second.headers["ETag"] != first.headers["ETag"]
+
+    def test_offload(self, app, client, media_root):
+        app.extensions["media"].offload = "x-accel"
+        resp = client.get("/media/notes.txt")
+        etag = resp.headers["ETag"]
+        not_modified = client.get("/media/notes.txt", headers={"If-None-Match": etag})
+
+        assert resp.headers["X-Accel-Redirect"] == "/protected-media/notes.txt"
+        assert resp.data == b""
+        assert not_modified.status_code == 304
+        assert "X-Accel-Redirect" not in not_modified.headers
+
+
+class TestPrecompressedMedia:
+    @pytest.fixture()
+    def styles(self, app, media_root):
+        (media_root / "css").mkdir()
+        path = media_root / "css" / "app.css"
+        path.write_text("body { margin: 0; }\n" * 200)
+        return path
+
+    def test_compress_command(self, runner, media_root, styles):
+        result = runner.invoke(args=["public", "compress-media"])
+        again = runner.invoke(args=["public", "compress-media"])
+
+        assert result.exit_code == 0, result.output
+        assert gzip.decompress((media_root / "css" / "app.css.gz").read_bytes()) == (
+            styles.read_bytes()
+        )
+        assert not (media_root / "logo.png.gz").exists()
+        assert "Written 1" in result.output
+        assert "Written 0, up to date 1" in again.output
+
+    def test_serve_precompressed(self, client, runner, styles):
+        runner.invoke(args=["public", "compress-media"])
+
+        plain = client.get("/media/css/app.css")
+        encoded = client.get("/media/css/app.css", headers={"Accept-Encoding": "gzip"})
+
+        assert plain.headers.get("Content-Encoding") is None
+        assert plain.data == styles.read_bytes()
+        assert encoded.headers["Content-Encoding"] == "gzip"
+        assert encoded.mimetype == "text/css"
+        assert gzip.decompress(encoded.data) == styles.read_bytes()
+        assert encoded.headers["ETag"] != plain.headers["ETag"]
+        assert encoded.headers["Vary"] == plain.headers["Vary"] == "Accept-Encoding"
+
+    def test_ignore_outdated(self, client, runner, styles):
+        runner.invoke(args=["public", "compress-media"])
+        gz = styles.parent / "app.css.gz"
+        os.utime(gz, ns=(0, styles.stat().st_mtime_ns - 10**9))
+
+        resp = client.get("/media/css/app.css", headers={"Accept-Encoding": "gzip"})
+
+        assert resp.headers.get("Content-Encoding") is None